@@ -1,14 +1,145 @@
 import sqlite3
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import Optional
 import os
 
+from utils.config import settings, Settings
+
+
+def sqlite_pragmas(config: Settings = settings) -> dict:
+    """PRAGMAs applied to every new SQLite connection"""
+    return {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        # Negative cache_size is expressed in KiB instead of pages
+        "cache_size": -config.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": config.SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+        "temp_store": "MEMORY",
+    }
+
+
+def _install_sqlite_pragmas(engine: Engine, pragmas: dict):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _install_sqlite_transactions(engine: Engine):
+    """Let SQLAlchemy, not pysqlite, decide where transactions begin and end.
+
+    pysqlite opens transactions lazily and commits the enclosing one when a
+    SAVEPOINT is released, so a batch of savepoints was never one atomic
+    commit. Connections run with the `sqlite_begin="IMMEDIATE"` execution
+    option take the write lock up front instead of on their first write.
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_sqlite_transaction(conn):
+        mode = conn.get_execution_options().get("sqlite_begin")
+        conn.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+def create_db_engine(database_url: Optional[str] = None, config: Settings = settings) -> Engine:
+    """Create an engine tuned for the backend selected by DATABASE_URL.
+
+    SQLite gets WAL journaling and per-connection PRAGMAs so readers no longer
+    block the writer; server databases get a sized QueuePool with pre-ping and
+    connection recycling.
+    """
+    url = make_url(database_url or config.DATABASE_URL)
+    backend = url.get_backend_name()
+
+    if backend == "sqlite":
+        engine = create_engine(
+            url,
+            echo=config.DB_ECHO,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+        )
+        _install_sqlite_transactions(engine)
+        _install_sqlite_pragmas(engine, sqlite_pragmas(config))
+        return engine
+
+    return create_engine(
+        url,
+        echo=config.DB_ECHO,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+
+
+# Async drivers used for each synchronous backend name
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def to_async_url(database_url: str) -> URL:
+    """Map a sync DATABASE_URL (sqlite://, postgresql://) onto its async driver"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_async_db_engine(database_url: Optional[str] = None, config: Settings = settings) -> AsyncEngine:
+    """Async counterpart of create_db_engine() using aiosqlite / asyncpg"""
+    url = to_async_url(database_url or config.DATABASE_URL)
+
+    if url.get_backend_name() == "sqlite":
+        options = {}
+        if url.database and url.database != ":memory:":
+            # aiosqlite defaults to NullPool for files; keep connections (and their PRAGMAs) warm
+            options["poolclass"] = AsyncAdaptedQueuePool
+        engine = create_async_engine(
+            url,
+            echo=config.DB_ECHO,
+            connect_args={"timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            **options
+        )
+        _install_sqlite_transactions(engine.sync_engine)
+        _install_sqlite_pragmas(engine.sync_engine, sqlite_pragmas(config))
+        return engine
+
+    return create_async_engine(
+        url,
+        echo=config.DB_ECHO,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+
+
 # Database configuration
-DATABASE_URL = "sqlite:///./unipass.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = settings.DATABASE_URL
+engine = create_db_engine(DATABASE_URL)
+async_engine = create_async_db_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -19,10 +150,30 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Async database dependency for FastAPI (does not block the event loop)"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     """Initialize database and create tables"""
-    from models.user import User
     from models.gym import Gym
+
+    migrate_db()
+
+    # Insert sample data if database is empty
+    db = SessionLocal()
+    try:
+        if db.query(Gym).count() == 0:
+            _create_sample_data(db)
+    finally:
+        db.close()
+
+def migrate_db():
+    """Create missing tables, columns and indexes and backfill derived data (idempotent)"""
+    from models.user import User
+    from models.gym import Gym, GymChange
     from models.checkin import CheckIn
     from models.admin import AdminUser
     from models.subscription import Plan, Subscription, Payment
@@ -30,18 +181,69 @@ def init_db():
     from models.gamification import Achievement, UserAchievement, UserPoints, PointHistory
     from models.support import SupportTicket, TicketMessage, GymReview, ReviewHelpful
     from models.features import Coupon, CouponUsage, Equipment, Reservation, ClassSchedule
+    from models.refresh_token import RefreshToken
+    from models.revoked_token import RevokedToken
+    from models.idempotency_key import IdempotencyKey
+    from utils.search import create_search_index
 
     # Create tables
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+    create_search_index(engine)
+    _backfill_checkin_dates()
+    _seed_gym_changes()
+
+
+def _add_missing_columns():
+    """Add nullable columns introduced after a table was first created"""
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import CreateColumn
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+
+def _backfill_checkin_dates():
+    """Fill checkins.checkin_date for rows created before the column existed"""
+    from models.checkin import CheckIn
+    from utils.dates import local_date
 
-    # Insert sample data if database is empty
     db = SessionLocal()
     try:
-        if db.query(Gym).count() == 0:
-            _create_sample_data(db)
+        while True:
+            batch = db.query(CheckIn).filter(CheckIn.checkin_date.is_(None)).limit(1000).all()
+            if not batch:
+                break
+            for checkin in batch:
+                checkin.checkin_date = local_date(checkin.checkin_time or checkin.created_at)
+            db.commit()
     finally:
         db.close()
 
+
+def _seed_gym_changes():
+    """Log every existing gym once when the change log is new, so a sync from 0 sees them all"""
+    with engine.begin() as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM gym_changes LIMIT 1").first() is None:
+            conn.exec_driver_sql("INSERT INTO gym_changes (gym_id) SELECT id FROM gyms ORDER BY id")
+
+
+def _create_missing_indexes():
+    """create_all() skips indexes on tables that already exist; add any new ones"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
 def _create_sample_data(db):
     """Create sample data for development"""
     from models.gym import Gym
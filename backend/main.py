@@ -2,20 +2,42 @@ from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
-from database.connection import init_db
+from database.connection import init_db, async_engine
 from routes import auth, users, gyms, checkins, admin, gamification, gym_admin, subscriptions
+from utils.auth import password_hasher
 from utils.config import settings
+from utils.group_commit import checkin_writer
+from utils.idempotency import IdempotencyMiddleware
+from utils.rate_limit import RateLimitMiddleware, get_rate_limit_backend
+from utils.revocation import refresh_revocation_list, run_revocation_sync
+from utils.occupancy import get_occupancy_store, refresh_occupancy_store, run_occupancy_sync
+from utils.occupancy_stream import occupancy_broadcaster
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    await refresh_occupancy_store()
+    occupancy_sync = asyncio.create_task(run_occupancy_sync(settings.OCCUPANCY_SYNC_SECONDS))
+    occupancy_stream = asyncio.create_task(occupancy_broadcaster.run())
+    await refresh_revocation_list()
+    revocation_sync = asyncio.create_task(run_revocation_sync(settings.REVOCATION_SYNC_SECONDS))
+    checkin_writer.start()
     yield
     # Shutdown
-    pass
+    await checkin_writer.stop()
+    occupancy_sync.cancel()
+    occupancy_stream.cancel()
+    revocation_sync.cancel()
+    get_occupancy_store().close()
+    password_hasher.shutdown()
+    if settings.RATE_LIMIT_PER_MINUTE > 0:
+        get_rate_limit_backend().close()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -25,6 +47,17 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Replays retried writes that carry an Idempotency-Key header
+app.add_middleware(IdempotencyMiddleware)
+
+# Per-caller request budget (outside idempotency, inside CORS so 429s stay readable)
+if settings.RATE_LIMIT_PER_MINUTE > 0:
+    app.add_middleware(
+        RateLimitMiddleware,
+        per_minute=settings.RATE_LIMIT_PER_MINUTE,
+        overrides=settings.RATE_LIMIT_OVERRIDES
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -10,6 +10,27 @@ class UserRole(enum.Enum):
     SUPER_ADMIN = "super_admin"
 
 
+# Bit per known permission, so token claims can carry them as one integer
+PERMISSION_BITS = {
+    name: 1 << bit for bit, name in enumerate([
+        "manage_users", "manage_gyms", "manage_plans", "view_analytics",
+        "manage_support", "system_admin", "user_management", "gym_management",
+        "reports"
+    ])
+}
+ALL_PERMISSIONS = sum(PERMISSION_BITS.values())
+
+
+def compile_permissions(permissions: list) -> int:
+    """Fold a permission name list into a bitmask ("all" grants every bit)"""
+    if "all" in permissions:
+        return ALL_PERMISSIONS
+    mask = 0
+    for name in permissions:
+        mask |= PERMISSION_BITS.get(name, 0)
+    return mask
+
+
 class AdminUser(Base):
     __tablename__ = "admin_users"
     
@@ -36,10 +57,14 @@ class AdminUser(Base):
         except:
             return []
     
+    @property
+    def permission_mask(self) -> int:
+        return compile_permissions(self.permissions_list)
+    
     def has_permission(self, permission: str) -> bool:
         if self.role == UserRole.SUPER_ADMIN:
             return True
-        return permission in self.permissions_list
+        return bool(self.permission_mask & PERMISSION_BITS.get(permission, 0))
     
     def can_manage_gym(self, gym_id: int) -> bool:
         if self.role == UserRole.SUPER_ADMIN:
@@ -1,15 +1,24 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Boolean, func
+from sqlalchemy import Column, Integer, ForeignKey, Date, DateTime, Boolean, Index, event, func
 from sqlalchemy.orm import relationship
+from datetime import datetime
 from database.connection import Base
+from utils.dates import local_date
 
 
 class CheckIn(Base):
     __tablename__ = "checkins"
+    __table_args__ = (
+        Index("ix_checkins_user_active", "user_id", "is_active"),
+        Index("ix_checkins_gym_time", "gym_id", "checkin_time"),
+        Index("ix_checkins_date", "checkin_date"),
+        Index("ix_checkins_gym_date", "gym_id", "checkin_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     gym_id = Column(Integer, ForeignKey("gyms.id"), nullable=False)
     checkin_time = Column(DateTime(timezone=True), server_default=func.now())
+    checkin_date = Column(Date, nullable=True)  # Local (settings.TIMEZONE) day of checkin_time
     checkout_time = Column(DateTime(timezone=True), nullable=True)
     is_active = Column(Boolean, default=True)  # True if still checked in
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -27,3 +36,11 @@ class CheckIn(Base):
             return None
         delta = self.checkout_time - self.checkin_time
         return int(delta.total_seconds() / 60)
+
+
+@event.listens_for(CheckIn, "before_insert")
+def _set_checkin_date(mapper, connection, target):
+    """Stamp the local day so day-bucketed stats can use an index instead of date()"""
+    if target.checkin_time is None:
+        target.checkin_time = datetime.utcnow()
+    target.checkin_date = local_date(target.checkin_time)
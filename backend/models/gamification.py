@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, func
 from sqlalchemy.orm import relationship
 from database.connection import Base
 
@@ -25,6 +25,9 @@ class Achievement(Base):
 
 class UserAchievement(Base):
     __tablename__ = "user_achievements"
+    __table_args__ = (
+        Index("ix_user_achievements_user_achievement", "user_id", "achievement_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -80,6 +83,9 @@ class UserPoints(Base):
 
 class PointHistory(Base):
     __tablename__ = "point_history"
+    __table_args__ = (
+        Index("ix_point_history_user_points_created", "user_points_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_points_id = Column(Integer, ForeignKey("user_points.id"), nullable=False)
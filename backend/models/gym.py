@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, Index, event, func, inspect, insert, text
 from database.connection import Base
+from utils.hours import minute_of_week, weekly_schedule
 
 
 class Gym(Base):
     __tablename__ = "gyms"
+    __table_args__ = (
+        # Bounding-box prefilter for searches around a point
+        Index("ix_gyms_active_lat_lon", "is_active", "latitude", "longitude"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -36,7 +41,67 @@ class Gym(Base):
             return 0
         return (self.current_occupancy / self.max_capacity) * 100
     
+    @property
+    def schedule(self):
+        return weekly_schedule(self.open_hours_weekdays, self.open_hours_weekends)
+    
     @property
     def is_open_now(self):
-        # Simple implementation - in real app would check current time
-        return self.is_active
+        return bool(self.is_active) and self.schedule.is_open(minute_of_week())
+
+
+# Columns the gym catalog is built from. current_occupancy is left out: it
+# moves on every check-in and is served live, not synced.
+CATALOG_FIELDS = (
+    "name", "address", "phone", "latitude", "longitude", "open_hours_weekdays",
+    "open_hours_weekends", "amenities", "description", "max_capacity", "rating",
+    "total_reviews", "is_active"
+)
+
+
+class GymChange(Base):
+    """Change log of the gym catalog: one row per gym inserted, edited or deleted.
+
+    `version` only grows (AUTOINCREMENT never reuses a value) and versions
+    become visible in order, so a client that has seen version N has seen
+    every change up to N. SQLite gets that for free: the insert takes the
+    database write lock, held until commit. PostgreSQL hands out sequence
+    values before commit, so appends take a transaction-scoped advisory
+    lock first (see _append_change). There is no foreign key: entries for
+    deleted gyms are what tell clients to drop them.
+    """
+    __tablename__ = "gym_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    version = Column(Integer, primary_key=True)
+    gym_id = Column(Integer, nullable=False, index=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<GymChange(version={self.version}, gym_id={self.gym_id})>"
+
+
+# Arbitrary key of the advisory lock that orders gym_changes appends on PostgreSQL
+GYM_CHANGE_LOCK_KEY = 0x756E6970  # "unip"
+
+
+def _append_change(connection, gym_id: int):
+    if connection.dialect.name == "postgresql":
+        # Held until commit, so version N+1 cannot commit before version N
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": GYM_CHANGE_LOCK_KEY})
+    connection.execute(insert(GymChange).values(gym_id=gym_id))
+
+
+# Logged in the same transaction as the change. Core UPDATEs bypass these
+# hooks, which is what keeps check-in occupancy updates out of the log.
+@event.listens_for(Gym, "after_insert")
+@event.listens_for(Gym, "after_delete")
+def _log_gym_change(mapper, connection, gym):
+    _append_change(connection, gym.id)
+
+
+@event.listens_for(Gym, "after_update")
+def _log_gym_update(mapper, connection, gym):
+    state = inspect(gym)
+    if any(state.attrs[field].history.has_changes() for field in CATALOG_FIELDS):
+        _append_change(connection, gym.id)
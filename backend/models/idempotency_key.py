@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, DateTime
+from database.connection import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # (token subject, Idempotency-Key header); the primary key decides which request runs
+    subject = Column(String(255), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of method, path, query and body
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    headers = Column(Text, nullable=True)  # JSON list of [name, value]
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(subject='{self.subject}', key='{self.key}', status={self.status_code})>"
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, func
+from database.connection import Base
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_revoked", "user_id", "revoked_at"),
+    )
+
+    # The token handed to the client is "<id>.<secret>"; only sha256(secret) is stored
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    family_id = Column(String(32), nullable=False, index=True)  # Shared by every rotation of one login
+    token_hash = Column(String(64), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<RefreshToken(id='{self.id}', user_id={self.user_id}, revoked={self.revoked_at is not None})>"
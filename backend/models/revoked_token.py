@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from database.connection import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    # jti of an access token revoked before it expired (e.g. on logout)
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}', user_id={self.user_id})>"
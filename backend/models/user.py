@@ -11,6 +11,7 @@ class User(Base):
     phone = Column(String(20), nullable=False)
     password_hash = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
+    tokens_revoked_at = Column(DateTime, nullable=True)  # Access tokens issued before this are rejected
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -8,35 +8,35 @@ from database.connection import get_db
 from models.user import User
 from models.gym import Gym
 from models.checkin import CheckIn
-from models.admin import AdminUser, UserRole
+from models.admin import UserRole
 from models.subscription import Subscription, Plan, Payment
 from models.audit import AuditLog
+from models.refresh_token import RefreshToken
 from models.support import SupportTicket
-from utils.auth import get_current_user
+from utils.auth import TokenClaims, get_token_claims, invalidate_cached_user, password_hasher, user_cache
+from utils.autocomplete import gym_autocomplete
+from utils.catalog import gym_catalog, plan_catalog
+from utils.dates import local_today
+from utils.occupancy_stream import occupancy_broadcaster
+from utils.revocation import revocation_list, unix_time
 
 router = APIRouter()
 
 
-async def get_super_admin(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Verify user is a super admin"""
-    admin_user = db.query(AdminUser).filter(
-        AdminUser.user_id == current_user.id,
-        AdminUser.role == UserRole.SUPER_ADMIN,
-        AdminUser.is_active == True
-    ).first()
-    
-    if not admin_user:
+async def get_super_admin(claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+    """Verify user is a super admin (from token claims, no database access)"""
+    if claims.role != UserRole.SUPER_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Super admin privileges required."
         )
     
-    return admin_user
+    return claims
 
 
 @router.get("/dashboard")
-async def get_admin_dashboard(
-    admin_user: AdminUser = Depends(get_super_admin),
+def get_admin_dashboard(
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Get admin dashboard overview"""
@@ -49,9 +49,8 @@ async def get_admin_dashboard(
     ).count()
     
     # Today's activity
-    today = datetime.utcnow().date()
     today_checkins = db.query(CheckIn).filter(
-        func.date(CheckIn.checkin_time) == today
+        CheckIn.checkin_date == local_today()
     ).count()
     
     # New users this week
@@ -118,11 +117,11 @@ async def get_admin_dashboard(
 
 
 @router.get("/users")
-async def get_users(
+def get_users(
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
     search: Optional[str] = None,
-    admin_user: AdminUser = Depends(get_super_admin),
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Get paginated list of users"""
@@ -181,11 +180,11 @@ async def get_users(
 
 
 @router.get("/gyms")
-async def get_gyms_admin(
+def get_gyms_admin(
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
     search: Optional[str] = None,
-    admin_user: AdminUser = Depends(get_super_admin),
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Get paginated list of gyms for admin"""
@@ -246,9 +245,9 @@ async def get_gyms_admin(
 
 
 @router.patch("/users/{user_id}/status")
-async def toggle_user_status(
+def toggle_user_status(
     user_id: int,
-    admin_user: AdminUser = Depends(get_super_admin),
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Activate or deactivate a user"""
@@ -263,6 +262,16 @@ async def toggle_user_status(
     old_status = user.is_active
     user.is_active = not user.is_active
     
+    if not user.is_active:
+        # Tokens issued until now stay rejected after a later reactivation
+        user.tokens_revoked_at = datetime.utcnow()
+        
+        # End every session: refresh tokens can no longer mint access tokens
+        db.query(RefreshToken).filter(
+            RefreshToken.user_id == user.id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    
     # Log the action
     AuditLog.log_action(
         db,
@@ -274,6 +283,11 @@ async def toggle_user_status(
     )
     
     db.commit()
+    invalidate_cached_user(user.email)
+    if user.is_active:
+        revocation_list.reactivate_user(user.id, unix_time(user.tokens_revoked_at or datetime.utcnow()))
+    else:
+        revocation_list.deactivate_user(user.id)
     
     return {
         "message": f"User {'activated' if user.is_active else 'deactivated'} successfully",
@@ -283,9 +297,9 @@ async def toggle_user_status(
 
 
 @router.patch("/gyms/{gym_id}/status")
-async def toggle_gym_status(
+def toggle_gym_status(
     gym_id: int,
-    admin_user: AdminUser = Depends(get_super_admin),
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Activate or deactivate a gym"""
@@ -320,9 +334,9 @@ async def toggle_gym_status(
 
 
 @router.get("/analytics/overview")
-async def get_analytics_overview(
+def get_analytics_overview(
     days: int = Query(30, ge=1, le=365),
-    admin_user: AdminUser = Depends(get_super_admin),
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Get analytics overview for specified period"""
@@ -331,11 +345,11 @@ async def get_analytics_overview(
     
     # Daily check-ins for the period
     daily_checkins = db.query(
-        func.date(CheckIn.checkin_time).label('date'),
+        CheckIn.checkin_date.label('date'),
         func.count(CheckIn.id).label('count')
     ).filter(
-        CheckIn.checkin_time >= start_date
-    ).group_by(func.date(CheckIn.checkin_time)).all()
+        CheckIn.checkin_date >= local_today() - timedelta(days=days)
+    ).group_by(CheckIn.checkin_date).all()
     
     # New users by day
     daily_signups = db.query(
@@ -371,13 +385,27 @@ async def get_analytics_overview(
     }
 
 
+@router.get("/metrics")
+def get_metrics(admin_user: TokenClaims = Depends(get_super_admin)):
+    """In-process metrics for this worker"""
+    
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "revocation": revocation_list.stats(),
+        "catalog": {"gyms": gym_catalog.stats(), "plans": plan_catalog.stats()},
+        "autocomplete": gym_autocomplete.stats(),
+        "occupancy_stream": occupancy_broadcaster.stats()
+    }
+
+
 @router.get("/audit-logs")
-async def get_audit_logs(
+def get_audit_logs(
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
     action: Optional[str] = None,
     user_id: Optional[int] = None,
-    admin_user: AdminUser = Depends(get_super_admin),
+    admin_user: TokenClaims = Depends(get_super_admin),
     db: Session = Depends(get_db)
 ):
     """Get audit logs with filtering"""
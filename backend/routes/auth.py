@@ -1,25 +1,64 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from fastapi.security import OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Optional
 
-from database.connection import get_db
+from database.connection import get_async_db
 from models.user import User
-from schemas.user import UserCreate, UserResponse, Token
+from models.admin import AdminUser
+from models.refresh_token import RefreshToken
+from models.revoked_token import RevokedToken
+from schemas.user import UserCreate, UserResponse, Token, RefreshRequest
 from utils.auth import (
     authenticate_user, 
+    access_token_claims,
     create_access_token, 
-    get_password_hash,
+    create_refresh_token,
+    decode_access_token,
+    parse_refresh_token,
+    refresh_token_matches,
+    password_hasher,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from utils.revocation import revocation_list
 
 router = APIRouter()
 
 
+async def issue_tokens(db: AsyncSession, user: User, family_id: Optional[str] = None) -> dict:
+    """Mint an access token and a new refresh token (in `family_id` when rotating), then commit"""
+    admin_user = await db.scalar(select(AdminUser).where(
+        AdminUser.user_id == user.id,
+        AdminUser.is_active == True
+    ))
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=access_token_claims(user, admin_user), expires_delta=access_token_expires
+    )
+    
+    stored_token, refresh_token = create_refresh_token(user.id, family_id)
+    db.add(stored_token)
+    await db.commit()
+    
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+async def revoke_refresh_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
 @router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,7 +66,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = User(
         name=user.name,
         email=user.email,
@@ -36,15 +75,15 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,14 +91,80 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    return await issue_tokens(db, user)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Rotate a refresh token into a new token pair (no password check)"""
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    parsed = parse_refresh_token(request.refresh_token)
+    if parsed is None:
+        raise invalid_token
+    token_id, secret = parsed
+    
+    stored_token = await db.get(RefreshToken, token_id)
+    if stored_token is None or not refresh_token_matches(stored_token, secret):
+        raise invalid_token
+    
+    if stored_token.revoked_at is not None:
+        # An already rotated token came back: assume it leaked and end the whole login
+        await revoke_refresh_family(db, stored_token.family_id)
+        raise invalid_token
+    
+    if stored_token.expires_at <= datetime.utcnow():
+        raise invalid_token
+    
+    # Retire the presented token; only one concurrent refresh can win
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored_token.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if rotated.rowcount == 0:
+        raise invalid_token
+    
+    user = await db.get(User, stored_token.user_id)
+    if user is None or not user.is_active:
+        await revoke_refresh_family(db, stored_token.family_id)
+        raise invalid_token
+    
+    return await issue_tokens(db, user, stored_token.family_id)
+
+
+@router.post("/logout")
+async def logout(
+    request: RefreshRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Revoke the refresh token and every rotation of it, plus the presented access token"""
+    payload = decode_access_token(credentials.credentials) if credentials else None
+    if payload and payload.get("jti"):
+        await db.merge(RevokedToken(
+            jti=payload["jti"],
+            user_id=payload.get("uid"),
+            expires_at=datetime.utcfromtimestamp(payload["exp"])
+        ))
+        await db.commit()
+        revocation_list.revoke_token(payload["jti"], payload["exp"])
+    
+    parsed = parse_refresh_token(request.refresh_token)
+    if parsed is not None:
+        token_id, secret = parsed
+        stored_token = await db.get(RefreshToken, token_id)
+        if stored_token is not None and refresh_token_matches(stored_token, secret):
+            await revoke_refresh_family(db, stored_token.family_id)
+    
+    return {"message": "Logged out"}
 
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     return await login(form_data, db)
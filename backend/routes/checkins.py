@@ -1,41 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 from typing import List
 
-from database.connection import get_db
+from database.connection import get_async_db
 from models.user import User
 from models.gym import Gym
 from models.checkin import CheckIn
-from schemas.checkin import CheckInCreate, CheckInResponse, CheckOutRequest
+from models.subscription import Subscription, SubscriptionStatus
+from schemas.checkin import CheckInCreate, CheckInResponse, CheckOutRequest, CheckInVisitResponse
+from routes.gamification import apply_checkin_points
 from utils.auth import get_current_user
+from utils.group_commit import checkin_writer
+from utils.occupancy import reserve_slot, release_slot, get_occupancy_store
 
 router = APIRouter()
 
 
-@router.post("/", response_model=CheckInResponse)
-async def create_checkin(
-    checkin_data: CheckInCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # Check if gym exists and is active
-    gym = db.query(Gym).filter(
-        Gym.id == checkin_data.gym_id,
-        Gym.is_active == True
-    ).first()
-    
-    if not gym:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Gym not found or inactive"
-        )
-    
+async def apply_checkin(db: AsyncSession, user_id: int, gym_id: int):
+    """Check-in write path; returns (checkin, (occupancy, capacity))"""
     # Check if user already has an active check-in
-    active_checkin = db.query(CheckIn).filter(
-        CheckIn.user_id == current_user.id,
+    active_checkin = await db.scalar(select(CheckIn).where(
+        CheckIn.user_id == user_id,
         CheckIn.is_active == True
-    ).first()
+    ))
     
     if active_checkin:
         raise HTTPException(
@@ -43,8 +33,18 @@ async def create_checkin(
             detail="You already have an active check-in. Please check out first."
         )
     
-    # Check gym capacity
-    if gym.current_occupancy >= gym.max_capacity:
+    # Reserve a slot: capacity check and increment in one conditional UPDATE
+    reserved = (await db.execute(reserve_slot(gym_id))).first()
+    if reserved is None:
+        gym = await db.scalar(select(Gym.id).where(
+            Gym.id == gym_id,
+            Gym.is_active == True
+        ))
+        if not gym:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Gym not found or inactive"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Gym is at full capacity"
@@ -52,33 +52,25 @@ async def create_checkin(
     
     # Create check-in
     checkin = CheckIn(
-        user_id=current_user.id,
-        gym_id=checkin_data.gym_id,
+        user_id=user_id,
+        gym_id=gym_id,
         is_active=True
     )
     
-    # Update gym occupancy
-    gym.current_occupancy += 1
-    
     db.add(checkin)
-    db.commit()
-    db.refresh(checkin)
+    await db.flush()
     
-    return checkin
+    return checkin, tuple(reserved)
 
 
-@router.post("/checkout", response_model=CheckInResponse)
-async def checkout(
-    checkout_data: CheckOutRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+async def apply_checkout(db: AsyncSession, user_id: int, checkin_id: int):
+    """Checkout write path; returns (checkin, (occupancy, capacity) or None)"""
     # Find the active check-in
-    checkin = db.query(CheckIn).filter(
-        CheckIn.id == checkout_data.checkin_id,
-        CheckIn.user_id == current_user.id,
+    checkin = await db.scalar(select(CheckIn).where(
+        CheckIn.id == checkin_id,
+        CheckIn.user_id == user_id,
         CheckIn.is_active == True
-    ).first()
+    ))
     
     if not checkin:
         raise HTTPException(
@@ -86,17 +78,115 @@ async def checkout(
             detail="Active check-in not found"
         )
     
-    # Update check-in
-    checkin.checkout_time = datetime.utcnow()
-    checkin.is_active = False
+    # Close the check-in only if it is still active (a concurrent checkout wins once)
+    closed = await db.execute(
+        update(CheckIn)
+        .where(CheckIn.id == checkin.id, CheckIn.is_active == True)
+        .values(checkout_time=datetime.utcnow(), is_active=False)
+        .execution_options(synchronize_session=False)
+    )
+    if closed.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Active check-in not found"
+        )
     
     # Update gym occupancy
-    gym = db.query(Gym).filter(Gym.id == checkin.gym_id).first()
-    if gym and gym.current_occupancy > 0:
-        gym.current_occupancy -= 1
+    released = (await db.execute(release_slot(checkin.gym_id))).first()
+    await db.refresh(checkin)
+    
+    return checkin, tuple(released) if released is not None else None
+
+
+async def apply_visit(db: AsyncSession, user_id: int, gym_id: int):
+    """Quota, capacity, check-in, points and achievements in one transaction"""
+    subscription = await db.scalar(select(Subscription).options(
+        selectinload(Subscription.plan)
+    ).where(
+        Subscription.user_id == user_id,
+        Subscription.status == SubscriptionStatus.ACTIVE
+    ))
+    
+    if not subscription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active subscription found"
+        )
+    
+    if not subscription.can_checkin():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Check-in limit reached for this month"
+        )
+    
+    # Count the visit only while still under the plan limit (concurrent visits race here)
+    checkins_limit = subscription.plan.max_checkins_per_month
+    usage = update(Subscription).where(Subscription.id == subscription.id)
+    if checkins_limit is not None:
+        usage = usage.where(Subscription.checkins_used_this_month < checkins_limit)
+    checkins_used = await db.scalar(
+        usage.values(checkins_used_this_month=Subscription.checkins_used_this_month + 1)
+        .returning(Subscription.checkins_used_this_month)
+        .execution_options(synchronize_session=False)
+    )
+    if checkins_used is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Check-in limit reached for this month"
+        )
+    
+    checkin, reserved = await apply_checkin(db, user_id, gym_id)
+    points = await db.run_sync(apply_checkin_points, user_id, checkin)
+    
+    result = {
+        "checkin": checkin,
+        "usage": {"checkins_used": checkins_used, "checkins_limit": checkins_limit},
+        "points": points
+    }
+    return result, reserved
+
+
+@router.post("/", response_model=CheckInResponse)
+async def create_checkin(
+    checkin_data: CheckInCreate,
+    current_user: User = Depends(get_current_user)
+):
+    checkin, reserved = await checkin_writer.submit(
+        lambda db: apply_checkin(db, current_user.id, checkin_data.gym_id)
+    )
+    get_occupancy_store().set(checkin.gym_id, *reserved)
+    
+    return checkin
+
+
+@router.post("/visit", response_model=CheckInVisitResponse)
+async def create_visit(
+    checkin_data: CheckInCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """Check in with subscription usage and gamification in a single request.
+    
+    Replaces POST /checkins/ + POST /subscriptions/usage/checkin +
+    POST /gamification/checkin-points; either all of it happens or none.
+    """
+    result, reserved = await checkin_writer.submit(
+        lambda db: apply_visit(db, current_user.id, checkin_data.gym_id)
+    )
+    get_occupancy_store().set(checkin_data.gym_id, *reserved)
     
-    db.commit()
-    db.refresh(checkin)
+    return result
+
+
+@router.post("/checkout", response_model=CheckInResponse)
+async def checkout(
+    checkout_data: CheckOutRequest,
+    current_user: User = Depends(get_current_user)
+):
+    checkin, released = await checkin_writer.submit(
+        lambda db: apply_checkout(db, current_user.id, checkout_data.checkin_id)
+    )
+    if released is not None:
+        get_occupancy_store().set(checkin.gym_id, *released)
     
     return checkin
 
@@ -104,12 +194,12 @@ async def checkout(
 @router.get("/active", response_model=CheckInResponse)
 async def get_active_checkin(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    checkin = db.query(CheckIn).filter(
+    checkin = await db.scalar(select(CheckIn).where(
         CheckIn.user_id == current_user.id,
         CheckIn.is_active == True
-    ).first()
+    ))
     
     if not checkin:
         raise HTTPException(
@@ -123,11 +213,11 @@ async def get_active_checkin(
 @router.get("/", response_model=List[CheckInResponse])
 async def get_user_checkins(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = 50
 ):
-    checkins = db.query(CheckIn).filter(
+    checkins = (await db.scalars(select(CheckIn).where(
         CheckIn.user_id == current_user.id
-    ).order_by(CheckIn.checkin_time.desc()).limit(limit).all()
+    ).order_by(CheckIn.checkin_time.desc()).limit(limit))).all()
     
     return checkins
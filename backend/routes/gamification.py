@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from typing import List
 from datetime import datetime, timedelta
 
@@ -9,12 +10,13 @@ from models.checkin import CheckIn
 from models.gamification import Achievement, UserAchievement, UserPoints, PointHistory
 from models.audit import AuditLog
 from utils.auth import get_current_user
+from utils.dates import local_date, local_today
 
 router = APIRouter()
 
 
 @router.get("/points")
-async def get_user_points(
+def get_user_points(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -42,7 +44,7 @@ async def get_user_points(
 
 
 @router.get("/achievements")
-async def get_user_achievements(
+def get_user_achievements(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -92,7 +94,7 @@ async def get_user_achievements(
 
 
 @router.get("/leaderboard")
-async def get_leaderboard(
+def get_leaderboard(
     period: str = "all_time",  # all_time, monthly, weekly
     limit: int = 50,
     current_user: User = Depends(get_current_user),
@@ -159,33 +161,16 @@ async def get_leaderboard(
     }
 
 
-@router.post("/checkin-points")
-async def award_checkin_points(
-    checkin_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Award points for a check-in"""
-    
-    # Verify check-in belongs to user
-    checkin = db.query(CheckIn).filter(
-        CheckIn.id == checkin_id,
-        CheckIn.user_id == current_user.id
-    ).first()
-    
-    if not checkin:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Check-in not found"
-        )
+def apply_checkin_points(db: Session, user_id: int, checkin: CheckIn) -> dict:
+    """Award check-in points, update the streak and evaluate achievements (no commit)"""
     
     # Get or create user points
     user_points = db.query(UserPoints).filter(
-        UserPoints.user_id == current_user.id
+        UserPoints.user_id == user_id
     ).first()
     
     if not user_points:
-        user_points = UserPoints(user_id=current_user.id)
+        user_points = UserPoints(user_id=user_id)
         db.add(user_points)
         db.flush()
     
@@ -193,13 +178,13 @@ async def award_checkin_points(
     base_points = 10
     
     # Bonus for consecutive days
-    today = datetime.utcnow().date()
+    today = local_today()
     yesterday = today - timedelta(days=1)
     
     # Check if user checked in yesterday
     yesterday_checkin = db.query(CheckIn).filter(
-        CheckIn.user_id == current_user.id,
-        func.date(CheckIn.checkin_time) == yesterday
+        CheckIn.user_id == user_id,
+        CheckIn.checkin_date == yesterday
     ).first()
     
     if yesterday_checkin:
@@ -212,7 +197,7 @@ async def award_checkin_points(
         base_points += streak_bonus
     else:
         # Reset streak if not consecutive
-        if user_points.last_checkin_date and user_points.last_checkin_date.date() != yesterday:
+        if user_points.last_checkin_date and local_date(user_points.last_checkin_date) != yesterday:
             user_points.current_streak = 1
     
     user_points.last_checkin_date = checkin.checkin_time
@@ -227,14 +212,12 @@ async def award_checkin_points(
         reason="CHECKIN",
         description=f"Check-in points + streak bonus",
         related_entity_type="CHECKIN",
-        related_entity_id=checkin_id
+        related_entity_id=checkin.id
     )
     db.add(point_history)
     
     # Check for achievements
-    new_achievements = check_and_award_achievements(current_user.id, db)
-    
-    db.commit()
+    new_achievements = check_and_award_achievements(user_id, db)
     
     return {
         "points_awarded": base_points,
@@ -246,8 +229,34 @@ async def award_checkin_points(
     }
 
 
+@router.post("/checkin-points")
+def award_checkin_points(
+    checkin_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Award points for a check-in"""
+    
+    # Verify check-in belongs to user
+    checkin = db.query(CheckIn).filter(
+        CheckIn.id == checkin_id,
+        CheckIn.user_id == current_user.id
+    ).first()
+    
+    if not checkin:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Check-in not found"
+        )
+    
+    result = apply_checkin_points(db, current_user.id, checkin)
+    db.commit()
+    
+    return result
+
+
 @router.get("/point-history")
-async def get_point_history(
+def get_point_history(
     limit: int = 50,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, update
 from typing import List
 from datetime import datetime, timedelta
 
@@ -8,34 +8,30 @@ from database.connection import get_db
 from models.user import User
 from models.gym import Gym
 from models.checkin import CheckIn
-from models.admin import AdminUser, UserRole
+from models.admin import UserRole
 from models.audit import AuditLog
-from utils.auth import get_current_user
+from utils.auth import TokenClaims, get_token_claims
+from utils.dates import local_today
+from utils.occupancy import release_slot, get_occupancy_store, live_occupancy, occupancy_percentage
 
 router = APIRouter()
 
 
-async def get_gym_admin(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Verify user is a gym admin"""
-    admin_user = db.query(AdminUser).filter(
-        AdminUser.user_id == current_user.id,
-        AdminUser.role.in_([UserRole.GYM_ADMIN, UserRole.SUPER_ADMIN]),
-        AdminUser.is_active == True
-    ).first()
-    
-    if not admin_user:
+async def get_gym_admin(claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+    """Verify user is a gym admin (from token claims, no database access)"""
+    if claims.role not in (UserRole.GYM_ADMIN, UserRole.SUPER_ADMIN):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Gym admin privileges required."
         )
     
-    return admin_user
+    return claims
 
 
 @router.get("/dashboard")
-async def get_gym_dashboard(
+def get_gym_dashboard(
     gym_id: int = None,
-    admin_user: AdminUser = Depends(get_gym_admin),
+    admin_user: TokenClaims = Depends(get_gym_admin),
     db: Session = Depends(get_db)
 ):
     """Get gym dashboard data"""
@@ -66,10 +62,10 @@ async def get_gym_dashboard(
     ).count()
     
     # Today's stats
-    today = datetime.utcnow().date()
+    today = local_today()
     today_checkins = db.query(CheckIn).filter(
         CheckIn.gym_id == target_gym_id,
-        func.date(CheckIn.checkin_time) == today
+        CheckIn.checkin_date == today
     ).count()
     
     # This week's stats
@@ -97,26 +93,32 @@ async def get_gym_dashboard(
     ).group_by(func.extract('hour', CheckIn.checkin_time)).all()
     
     # Daily trend (last 7 days)
+    daily_counts = dict(db.query(
+        CheckIn.checkin_date,
+        func.count(CheckIn.id)
+    ).filter(
+        CheckIn.gym_id == target_gym_id,
+        CheckIn.checkin_date > today - timedelta(days=7)
+    ).group_by(CheckIn.checkin_date).all())
+    
     daily_checkins = []
     for i in range(7):
-        date = datetime.utcnow().date() - timedelta(days=i)
-        count = db.query(CheckIn).filter(
-            CheckIn.gym_id == target_gym_id,
-            func.date(CheckIn.checkin_time) == date
-        ).count()
+        date = today - timedelta(days=i)
         daily_checkins.append({
             "date": date.isoformat(),
-            "checkins": count
+            "checkins": daily_counts.get(date, 0)
         })
     
+    occupancy, capacity = live_occupancy(gym)
+    
     return {
         "gym": {
             "id": gym.id,
             "name": gym.name,
             "address": gym.address,
-            "current_occupancy": gym.current_occupancy,
-            "max_capacity": gym.max_capacity,
-            "occupancy_percentage": gym.occupancy_percentage
+            "current_occupancy": occupancy,
+            "max_capacity": capacity,
+            "occupancy_percentage": occupancy_percentage(occupancy, capacity)
         },
         "stats": {
             "active_checkins": active_checkins,
@@ -133,9 +135,9 @@ async def get_gym_dashboard(
 
 
 @router.get("/active-checkins")
-async def get_active_checkins(
+def get_active_checkins(
     gym_id: int = None,
-    admin_user: AdminUser = Depends(get_gym_admin),
+    admin_user: TokenClaims = Depends(get_gym_admin),
     db: Session = Depends(get_db)
 ):
     """Get list of currently active check-ins"""
@@ -162,10 +164,10 @@ async def get_active_checkins(
 
 
 @router.post("/force-checkout/{checkin_id}")
-async def force_checkout(
+def force_checkout(
     checkin_id: int,
     reason: str = "Forced by gym admin",
-    admin_user: AdminUser = Depends(get_gym_admin),
+    admin_user: TokenClaims = Depends(get_gym_admin),
     db: Session = Depends(get_db)
 ):
     """Force checkout a user (emergency/closing time)"""
@@ -188,14 +190,21 @@ async def force_checkout(
             detail="Cannot manage check-ins for other gyms"
         )
     
-    # Force checkout
-    checkin.checkout_time = datetime.utcnow()
-    checkin.is_active = False
+    # Force checkout, unless the user checked out in the meantime
+    closed = db.execute(
+        update(CheckIn)
+        .where(CheckIn.id == checkin.id, CheckIn.is_active == True)
+        .values(checkout_time=datetime.utcnow(), is_active=False)
+        .execution_options(synchronize_session=False)
+    )
+    if closed.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Active check-in not found"
+        )
     
     # Update gym occupancy
-    gym = db.query(Gym).filter(Gym.id == checkin.gym_id).first()
-    if gym and gym.current_occupancy > 0:
-        gym.current_occupancy -= 1
+    released = db.execute(release_slot(checkin.gym_id)).first()
     
     # Log the action
     AuditLog.log_action(
@@ -208,15 +217,17 @@ async def force_checkout(
     )
     
     db.commit()
+    if released is not None:
+        get_occupancy_store().set(checkin.gym_id, *released)
     
     return {"message": "User checked out successfully", "checkin_id": checkin_id}
 
 
 @router.patch("/update-capacity")
-async def update_gym_capacity(
+def update_gym_capacity(
     new_capacity: int,
     gym_id: int = None,
-    admin_user: AdminUser = Depends(get_gym_admin),
+    admin_user: TokenClaims = Depends(get_gym_admin),
     db: Session = Depends(get_db)
 ):
     """Update gym capacity"""
@@ -244,16 +255,17 @@ async def update_gym_capacity(
     )
     
     db.commit()
+    get_occupancy_store().set(gym.id, gym.current_occupancy, gym.max_capacity)
     
     return {"message": "Gym capacity updated successfully", "new_capacity": new_capacity}
 
 
 @router.get("/reports/checkins")
-async def get_checkins_report(
+def get_checkins_report(
     start_date: str,
     end_date: str,
     gym_id: int = None,
-    admin_user: AdminUser = Depends(get_gym_admin),
+    admin_user: TokenClaims = Depends(get_gym_admin),
     db: Session = Depends(get_db)
 ):
     """Get detailed check-ins report for date range"""
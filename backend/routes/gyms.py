@@ -1,119 +1,275 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 from typing import List, Optional
-import math
 
-from database.connection import get_db
-from models.gym import Gym
-from schemas.gym import GymResponse, GymSearchResponse
+import numpy as np
+
+from database.connection import async_engine, get_async_db
+from models.gym import Gym, GymChange
+from schemas.gym import GymChanges, GymFacets, GymResponse, GymSearchResponse, GymSuggestion
 from utils.auth import get_current_user_optional
+from utils.autocomplete import gym_autocomplete
+from utils.catalog import GymCatalog, get_gym_catalog
+from utils.config import settings
+from utils.etag import json_response, not_modified
+from utils.geo import bounding_box, distances_km
+from utils.hours import minute_of_week
+from utils.occupancy import live_occupancy, occupancy_percentage
+from utils.occupancy_stream import occupancy_broadcaster
+from utils.search import (
+    combined_score, match_clause, match_expression, relevance, search_index, supports_full_text
+)
 
 router = APIRouter()
 
+# Text matches fetched per result when re-ranking them by distance
+SEARCH_CANDIDATE_FACTOR = 5
+
+
+def gym_summary(gym, distance: Optional[float] = None) -> dict:
+    occupancy, capacity = live_occupancy(gym)
+    gym_data = {
+        "id": gym.id,
+        "name": gym.name,
+        "address": gym.address,
+        "rating": gym.rating,
+        "is_open_now": gym.is_open_now,
+        "current_occupancy": occupancy,
+        "max_capacity": capacity,
+        "occupancy_percentage": occupancy_percentage(occupancy, capacity)
+    }
+    if distance is not None:
+        gym_data["distance"] = round(distance, 2)
+    return gym_data
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = (math.sin(delta_lat / 2) ** 2 + 
-         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
+
+def catalog_filter(
+    catalog: GymCatalog,
+    amenities: Optional[str],
+    open_now: bool,
+    open_at: Optional[datetime]
+) -> Optional[np.ndarray]:
+    """Mask of the catalog gyms passing the listing filters, or None if there are none"""
+    allowed = None
+    if amenities:
+        allowed = catalog.amenity_mask([key for key in amenities.split(",") if key.strip()])
+    # One bit column of the compiled hours answers the open filter for every gym
+    if open_at is not None or open_now:
+        is_open = catalog.open_mask(minute_of_week(open_at))
+        allowed = is_open if allowed is None else allowed & is_open
+    return allowed
 
 
 @router.get("/", response_model=List[GymSearchResponse])
 async def get_gyms(
-    db: Session = Depends(get_db),
+    request: Request,
     lat: Optional[float] = Query(None, description="User latitude for distance calculation"),
     lon: Optional[float] = Query(None, description="User longitude for distance calculation"),
-    radius: Optional[float] = Query(10.0, description="Search radius in kilometers"),
+    radius: Optional[float] = Query(10.0, description="Search radius in kilometers (0 for the nearest gyms at any distance)"),
+    amenities: Optional[str] = Query(None, description="Comma-separated amenity ids or names; gyms must have all"),
+    open_now: bool = Query(False, description="Only gyms open right now"),
+    open_at: Optional[datetime] = Query(None, description="Only gyms open at this time (ISO 8601; local time if no offset)"),
     limit: int = Query(50, le=100)
 ):
-    query = db.query(Gym).filter(Gym.is_active == True)
-    gyms = query.limit(limit).all()
-    
-    result = []
-    for gym in gyms:
-        gym_data = {
-            "id": gym.id,
-            "name": gym.name,
-            "address": gym.address,
-            "rating": gym.rating,
-            "is_open_now": gym.is_open_now,
-            "current_occupancy": gym.current_occupancy,
-            "max_capacity": gym.max_capacity,
-            "occupancy_percentage": gym.occupancy_percentage
-        }
-        
-        # Calculate distance if user coordinates provided
-        if lat is not None and lon is not None:
-            distance = calculate_distance(lat, lon, gym.latitude, gym.longitude)
-            gym_data["distance"] = round(distance, 2)
-            
-            # Filter by radius if specified
-            if distance > radius:
-                continue
-        
-        result.append(gym_data)
-    
-    # Sort by distance if coordinates provided
-    if lat is not None and lon is not None:
-        result.sort(key=lambda x: x.get("distance", float('inf')))
-    
-    return result
+    catalog = await get_gym_catalog()
+    allowed = catalog_filter(catalog, amenities, open_now, open_at)
+
+    if lat is None or lon is None:
+        matches = [(None, gym) for gym in catalog.first(limit, allowed)]
+    # Nearest first: the grid index only visits cells that can hold a match
+    elif radius is not None and radius > 0:
+        matches = catalog.within(lat, lon, radius, allowed)[:limit]
+    else:
+        matches = catalog.nearest(lat, lon, limit, allowed)
+
+    minute = minute_of_week()
+    etag = catalog.etag([gym for _, gym in matches], minute)
+    return not_modified(request, etag) or json_response(catalog.summary_json(matches, minute), etag)
+
+
+@router.get("/facets", response_model=GymFacets)
+async def get_gym_facets(
+    lat: Optional[float] = Query(None),
+    lon: Optional[float] = Query(None),
+    radius: Optional[float] = Query(None, description="Only count gyms within this many kilometers of lat/lon"),
+    amenities: Optional[str] = Query(None, description="Comma-separated amenity ids or names; gyms must have all"),
+    open_now: bool = Query(False),
+    open_at: Optional[datetime] = Query(None)
+):
+    """Amenity, occupancy and rating counts for the gyms matching the same filters as the listing"""
+    catalog = await get_gym_catalog()
+    allowed = catalog_filter(catalog, amenities, open_now, open_at)
+    if lat is not None and lon is not None and radius is not None and radius > 0:
+        nearby = catalog.nearby_mask(lat, lon, radius)
+        allowed = nearby if allowed is None else allowed & nearby
+    return catalog.facets(allowed)
+
+
+@router.get("/changes", response_model=GymChanges)
+async def get_gym_changes(
+    since: int = Query(0, ge=0, description="`version` returned by the previous sync; 0 for every gym"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Gyms added, edited, deactivated or deleted after `since`, for incremental offline sync"""
+    latest = await db.scalar(select(func.max(GymChange.version))) or 0
+    # A version from another database (or a restored backup) cannot be resumed
+    reset = since > latest
+    if reset:
+        since = 0
+
+    # Latest change per gym, oldest first, so a page boundary is a valid version to resume from
+    last_change = func.max(GymChange.version).label("version")
+    rows = (await db.execute(
+        select(GymChange.gym_id, last_change)
+        .where(GymChange.version > since)
+        .group_by(GymChange.gym_id)
+        .order_by(last_change)
+        .limit(limit + 1)
+    )).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    gyms = {
+        gym.id: gym
+        for gym in (await db.scalars(select(Gym).where(Gym.id.in_([gym_id for gym_id, _ in rows])))).all()
+    }
+    upserts, deleted = [], []
+    for gym_id, _ in rows:
+        gym = gyms.get(gym_id)
+        if gym is not None and gym.is_active:
+            upserts.append(gym)
+        else:
+            deleted.append(gym_id)
+
+    if has_more:
+        version = rows[-1].version
+    else:
+        version = max([latest, since] + [row.version for row in rows])
+    return {"version": version, "reset": reset, "has_more": has_more, "upserts": upserts, "deleted": deleted}
+
+
+@router.get("/occupancy/stream")
+async def stream_occupancy(
+    ids: Optional[str] = Query(None, description="Comma-separated gym ids to watch"),
+    bbox: Optional[str] = Query(None, description="Watch the gyms in min_lat,min_lon,max_lat,max_lon")
+):
+    """Server-sent events with live occupancy: current values first, then changes batched per second"""
+    catalog = await get_gym_catalog()
+    try:
+        if ids:
+            gym_ids = {int(gym_id) for gym_id in ids.split(",") if gym_id.strip()}
+        elif bbox:
+            min_lat, min_lon, max_lat, max_lon = (float(value) for value in bbox.split(","))
+            gym_ids = set(catalog.box(min_lat, min_lon, max_lat, max_lon))
+        else:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass ids=1,2,3 or bbox=min_lat,min_lon,max_lat,max_lon"
+        )
+    if len(gym_ids) > settings.OCCUPANCY_STREAM_MAX_GYMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.OCCUPANCY_STREAM_MAX_GYMS} gyms per stream; narrow the selection"
+        )
+    if occupancy_broadcaster.is_full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open occupancy streams, try again later"
+        )
+
+    gyms = [gym for gym in map(catalog.get, sorted(gym_ids)) if gym is not None]
+    return StreamingResponse(
+        occupancy_broadcaster.stream(gyms, settings.OCCUPANCY_STREAM_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx would otherwise hold events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/search", response_model=List[GymSearchResponse])
 async def search_gyms(
     q: str = Query(..., description="Search query"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     lat: Optional[float] = Query(None),
     lon: Optional[float] = Query(None),
+    radius: Optional[float] = Query(None, description="Only gyms within this many kilometers of lat/lon"),
     limit: int = Query(20, le=50)
 ):
-    # Search in name and address
-    query = db.query(Gym).filter(
-        Gym.is_active == True,
-        (Gym.name.ilike(f"%{q}%") | Gym.address.ilike(f"%{q}%"))
-    )
-    
-    gyms = query.limit(limit).all()
-    
-    result = []
-    for gym in gyms:
-        gym_data = {
-            "id": gym.id,
-            "name": gym.name,
-            "address": gym.address,
-            "rating": gym.rating,
-            "is_open_now": gym.is_open_now,
-            "current_occupancy": gym.current_occupancy,
-            "max_capacity": gym.max_capacity,
-            "occupancy_percentage": gym.occupancy_percentage
-        }
-        
-        if lat is not None and lon is not None:
-            distance = calculate_distance(lat, lon, gym.latitude, gym.longitude)
-            gym_data["distance"] = round(distance, 2)
-        
-        result.append(gym_data)
-    
-    return result
+    expression = match_expression(q) if supports_full_text(async_engine.sync_engine) else None
+    if expression is not None:
+        # Full-text match over name, address, amenities and description, best bm25 first
+        query = (
+            select(Gym, relevance().label("rank"))
+            .join(search_index, search_index.c.rowid == Gym.id)
+            .where(Gym.is_active == True, match_clause(expression))
+            .order_by("rank")
+        )
+    else:
+        # Search in name and address
+        query = select(Gym, literal(0.0)).where(
+            Gym.is_active == True,
+            (Gym.name.ilike(f"%{q}%") | Gym.address.ilike(f"%{q}%"))
+        )
+
+    located = lat is not None and lon is not None
+    nearby = located and radius is not None and radius > 0
+    if nearby:
+        # The bounding box is served by ix_gyms_active_lat_lon; the exact distance check follows
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius)
+        query = query.where(
+            Gym.latitude.between(min_lat, max_lat),
+            Gym.longitude.between(min_lon, max_lon)
+        )
+    elif located and expression is not None:
+        # Re-ranked by distance below, so look past the first page of text matches
+        query = query.limit(limit * SEARCH_CANDIDATE_FACTOR)
+    else:
+        query = query.limit(limit)
+
+    rows = (await db.execute(query)).all()
+
+    if not located:
+        return [gym_summary(gym) for gym, _ in rows[:limit]]
+
+    distances = distances_km(lat, lon, [(gym.latitude, gym.longitude) for gym, _ in rows]).tolist()
+    results = [
+        (distance, gym, rank) for distance, (gym, rank) in zip(distances, rows)
+        if not nearby or distance <= radius
+    ]
+    if expression is not None:
+        results.sort(key=lambda result: combined_score(result[2], result[0]), reverse=True)
+    elif nearby:
+        results.sort(key=lambda result: result[0])
+    return [gym_summary(gym, distance) for distance, gym, _ in results[:limit]]
+
+
+@router.get("/autocomplete", response_model=List[GymSuggestion])
+async def autocomplete_gyms(
+    q: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    limit: int = Query(10, ge=1, le=10)
+):
+    """Gym suggestions by name or neighborhood while the user types, tolerant of typos"""
+    # Re-indexes only the gyms that changed since the last catalog snapshot
+    gym_autocomplete.sync(await get_gym_catalog())
+    return gym_autocomplete.search(q, limit)
 
 
 @router.get("/{gym_id}", response_model=GymResponse)
-async def get_gym(gym_id: int, db: Session = Depends(get_db)):
-    gym = db.query(Gym).filter(Gym.id == gym_id, Gym.is_active == True).first()
+async def get_gym(gym_id: int, request: Request):
+    catalog = await get_gym_catalog()
+    gym = catalog.get(gym_id)
     if not gym:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Gym not found"
         )
     
-    return gym
+    minute = minute_of_week()
+    etag = catalog.etag([gym], minute)
+    return not_modified(request, etag) or json_response(catalog.detail_json(gym, minute), etag)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, timedelta
@@ -8,35 +8,21 @@ from models.user import User
 from models.subscription import Plan, Subscription, Payment, PlanType, SubscriptionStatus, PaymentStatus
 from models.audit import AuditLog
 from utils.auth import get_current_user
+from utils.catalog import get_plan_catalog
+from utils.etag import json_response, not_modified
 
 router = APIRouter()
 
 
 @router.get("/plans", response_model=List[dict])
-async def get_available_plans(db: Session = Depends(get_db)):
+async def get_available_plans(request: Request):
     """Get all available subscription plans"""
-    plans = db.query(Plan).filter(Plan.is_active == True).all()
-    
-    plans_data = []
-    for plan in plans:
-        plans_data.append({
-            "id": plan.id,
-            "name": plan.name,
-            "description": plan.description,
-            "plan_type": plan.plan_type.value,
-            "price_monthly": plan.price_monthly,
-            "price_yearly": plan.price_yearly,
-            "max_checkins_per_month": plan.max_checkins_per_month,
-            "max_gyms_access": plan.max_gyms_access,
-            "features": plan.features_list,
-            "savings_yearly": (plan.price_monthly * 12 - plan.price_yearly) if plan.price_yearly else 0
-        })
-    
-    return plans_data
+    catalog = await get_plan_catalog()
+    return not_modified(request, catalog.etag) or json_response(catalog.body, catalog.etag)
 
 
 @router.get("/my-subscription")
-async def get_current_subscription(
+def get_current_subscription(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -71,7 +57,7 @@ async def get_current_subscription(
 
 
 @router.post("/subscribe/{plan_id}")
-async def subscribe_to_plan(
+def subscribe_to_plan(
     plan_id: int,
     is_yearly: bool = False,
     current_user: User = Depends(get_current_user),
@@ -164,7 +150,7 @@ async def subscribe_to_plan(
 
 
 @router.post("/cancel")
-async def cancel_subscription(
+def cancel_subscription(
     reason: str = "User requested",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -206,7 +192,7 @@ async def cancel_subscription(
 
 
 @router.post("/renew")
-async def renew_subscription(
+def renew_subscription(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -271,7 +257,7 @@ async def renew_subscription(
 
 
 @router.get("/payment-history")
-async def get_payment_history(
+def get_payment_history(
     limit: int = 50,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -309,7 +295,7 @@ async def get_payment_history(
 
 
 @router.post("/usage/checkin")
-async def increment_checkin_usage(
+def increment_checkin_usage(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -345,7 +331,7 @@ async def increment_checkin_usage(
 
 
 @router.get("/limits")
-async def get_subscription_limits(
+def get_subscription_limits(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -1,19 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 
-from database.connection import get_db
+from database.connection import get_async_db
 from models.user import User
 from models.checkin import CheckIn
 from schemas.user import UserResponse, UserUpdate
 from schemas.checkin import CheckInWithDetails
-from utils.auth import get_current_user
+from utils.auth import get_current_user, invalidate_cached_user
+from utils.etag import PRIVATE_REVALIDATE, not_modified, validator_headers
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
+    # The snapshot comes from the per-worker user cache, so a revalidation usually touches no table
+    cached = not_modified(request, current_user.etag, PRIVATE_REVALIDATE)
+    if cached is not None:
+        return cached
+    response.headers.update(validator_headers(current_user.etag, PRIVATE_REVALIDATE))
     return current_user
 
 
@@ -21,17 +33,17 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 async def update_current_user(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Update only provided fields
     update_data = user_update.dict(exclude_unset=True)
     
     # Check if email is being updated and if it's already taken
     if "email" in update_data:
-        existing_user = db.query(User).filter(
+        existing_user = await db.scalar(select(User).where(
             User.email == update_data["email"],
             User.id != current_user.id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,24 +51,26 @@ async def update_current_user(
             )
     
     # Apply updates
+    user = await db.get(User, current_user.id)
     for field, value in update_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_cached_user(current_user.email)
     
-    return current_user
+    return user
 
 
 @router.get("/me/checkins", response_model=List[CheckInWithDetails])
 async def get_user_checkins(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = 50
 ):
-    checkins = db.query(CheckIn).filter(
+    checkins = (await db.scalars(select(CheckIn).where(
         CheckIn.user_id == current_user.id
-    ).order_by(CheckIn.checkin_time.desc()).limit(limit).all()
+    ).options(selectinload(CheckIn.gym)).order_by(CheckIn.checkin_time.desc()).limit(limit))).all()
     
     # Add gym details to each checkin
     result = []
@@ -80,21 +94,23 @@ async def get_user_checkins(
 @router.get("/me/stats")
 async def get_user_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Get user statistics
-    total_checkins = db.query(CheckIn).filter(CheckIn.user_id == current_user.id).count()
+    total_checkins = await db.scalar(
+        select(func.count(CheckIn.id)).where(CheckIn.user_id == current_user.id)
+    )
     
     # Count unique gyms visited
-    unique_gyms = db.query(CheckIn.gym_id).filter(
-        CheckIn.user_id == current_user.id
-    ).distinct().count()
+    unique_gyms = await db.scalar(
+        select(func.count(CheckIn.gym_id.distinct())).where(CheckIn.user_id == current_user.id)
+    )
     
     # Calculate total hours (approximate)
-    completed_checkins = db.query(CheckIn).filter(
+    completed_checkins = (await db.scalars(select(CheckIn).where(
         CheckIn.user_id == current_user.id,
         CheckIn.checkout_time.isnot(None)
-    ).all()
+    ))).all()
     
     total_minutes = sum(checkin.duration_minutes or 0 for checkin in completed_checkins)
     total_hours = total_minutes // 60
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class CheckInBase(BaseModel):
@@ -33,3 +33,23 @@ class CheckInWithDetails(CheckInResponse):
 
 class CheckOutRequest(BaseModel):
     checkin_id: int
+
+
+class CheckInUsage(BaseModel):
+    checkins_used: int
+    checkins_limit: Optional[int] = None
+
+
+class CheckInPoints(BaseModel):
+    points_awarded: int
+    total_points: int
+    level: int
+    level_up: bool
+    current_streak: int
+    new_achievements: List[dict]
+
+
+class CheckInVisitResponse(BaseModel):
+    checkin: CheckInResponse
+    usage: CheckInUsage
+    points: CheckInPoints
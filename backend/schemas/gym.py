@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 
 class GymBase(BaseModel):
@@ -47,6 +47,14 @@ class GymResponse(GymBase):
         from_attributes = True
 
 
+class GymChanges(BaseModel):
+    version: int  # send as `since` on the next sync
+    reset: bool = False  # `since` is unknown here: replace the local copy with `upserts`
+    has_more: bool = False
+    upserts: List[GymResponse]
+    deleted: List[int]  # gyms removed or deactivated
+
+
 class GymSearchResponse(BaseModel):
     id: int
     name: str
@@ -60,3 +68,26 @@ class GymSearchResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class GymSuggestion(BaseModel):
+    id: int
+    name: str
+    neighborhood: Optional[str] = None
+    address: str
+    
+    class Config:
+        from_attributes = True
+
+
+class AmenityFacet(BaseModel):
+    id: str
+    label: str
+    count: int
+
+
+class GymFacets(BaseModel):
+    total: int
+    amenities: List[AmenityFacet]
+    occupancy: Dict[str, int]
+    rating: Dict[str, int]
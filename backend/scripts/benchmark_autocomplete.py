@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Gym autocomplete latency benchmark
+
+Fills utils.autocomplete.AutocompleteIndex with synthetic gyms (chain name +
+neighborhood) and times typical keystroke queries, including typos, against
+the 2 ms budget of /api/gyms/autocomplete.
+
+Usage:
+    python scripts/benchmark_autocomplete.py --gyms 10000 --repeat 200
+"""
+import sys
+import os
+import argparse
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.autocomplete import AutocompleteIndex
+
+CHAINS = ["Smart Fit", "Bio Ritmo", "Academia Forma", "Bodytech", "Selfit", "Blue Fit",
+          "CrossFit Pinheiros", "Studio Pilates", "Just Fit", "Competition"]
+NEIGHBORHOODS = ["Centro", "Bela Vista", "Consolação", "Pinheiros", "Moema", "Vila Mariana", "Tatuapé",
+                 "Santana", "Lapa", "Butantã", "Ipiranga", "Mooca", "Perdizes", "Itaim Bibi", "Vila Madalena"]
+QUERIES = ["s", "sm", "smart", "smrat", "pinh", "pinheiros smart", "tatuape", "bio ritm",
+           "crosfit", "vila madal", "moema 12", "zzzz"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gym autocomplete")
+    parser.add_argument("--gyms", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = AutocompleteIndex()
+    started = time.perf_counter()
+    for gym_id in range(1, args.gyms + 1):
+        chain, area = rng.choice(CHAINS), rng.choice(NEIGHBORHOODS)
+        index.add(gym_id, f"{chain} {area} {gym_id}", f"Rua {gym_id}, 1 - {area}, São Paulo - SP", rng.random() * 5)
+    print(f"Indexed {args.gyms} gyms in {(time.perf_counter() - started) * 1000:.0f} ms: {index.stats()}")
+
+    over_budget = 0
+    for query in QUERIES:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            results = index.search(query)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / args.repeat
+        over_budget += elapsed_ms > args.budget_ms
+        top = results[0].name if results else "-"
+        print(f"{query!r:20} {elapsed_ms:7.3f} ms  {len(results):2d} results  top: {top}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Distance engine micro-benchmark for the gym listing
+
+Compares three ways of answering "gyms within R km, nearest first" and
+"the k nearest gyms" over synthetic catalogs clustered around São Paulo:
+
+  - scalar loop:  math haversine once per gym in a Python loop, then sort
+                  (what GET /api/gyms did before the catalog)
+  - vectorized:   NumPy haversine over the whole coordinate columns, mask, argsort
+  - grid index:   utils.geo.GridIndex, vectorized over the nearby cells only
+
+Usage:
+    python scripts/benchmark_geo.py --sizes 1000 10000 100000 --radius 5 --k 20
+"""
+import sys
+import os
+import argparse
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.geo import GridIndex, haversine_km, haversine_km_array
+
+CENTER = (-23.55, -46.63)
+
+
+def make_points(size: int, spread: float, seed: int):
+    rng = random.Random(seed)
+    return [
+        (i, CENTER[0] + rng.gauss(0, spread), CENTER[1] + rng.gauss(0, spread))
+        for i in range(size)
+    ]
+
+
+def scalar_within(points, lat, lon, radius):
+    result = []
+    for key, point_lat, point_lon in points:
+        distance = haversine_km(lat, lon, point_lat, point_lon)
+        if distance <= radius:
+            result.append((distance, key))
+    result.sort()
+    return result
+
+
+def scalar_nearest(points, lat, lon, k):
+    return sorted((haversine_km(lat, lon, point_lat, point_lon), key) for key, point_lat, point_lon in points)[:k]
+
+
+class Columns:
+    """The whole catalog as columns, without any spatial bucketing"""
+
+    def __init__(self, points):
+        self.keys = np.array([point[0] for point in points], dtype=np.int64)
+        self.lat_rad = np.radians(np.array([point[1] for point in points]))
+        self.lon_rad = np.radians(np.array([point[2] for point in points]))
+        self.cos_lat = np.cos(self.lat_rad)
+
+    def within(self, lat, lon, radius):
+        distances = haversine_km_array(lat, lon, self.lat_rad, self.lon_rad, self.cos_lat)
+        inside = np.flatnonzero(distances <= radius)
+        order = inside[np.argsort(distances[inside], kind="stable")]
+        return list(zip(distances[order].tolist(), self.keys[order].tolist()))
+
+    def nearest(self, lat, lon, k):
+        distances = haversine_km_array(lat, lon, self.lat_rad, self.lon_rad, self.cos_lat)
+        best = np.argpartition(distances, min(k, len(distances)) - 1)[:k]
+        order = best[np.argsort(distances[best], kind="stable")]
+        return list(zip(distances[order].tolist(), self.keys[order].tolist()))
+
+
+def time_queries(function, queries, repeat: int) -> float:
+    """Mean milliseconds per query"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            function(*query)
+    return (time.perf_counter() - started) * 1000 / (repeat * len(queries))
+
+
+def same_results(a, b) -> bool:
+    return [key for _, key in a] == [key for _, key in b] and all(
+        abs(x - y) < 1e-6 for (x, _), (y, _) in zip(a, b)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gym distance queries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--radius", type=float, default=5.0, help="Radius for within queries (km)")
+    parser.add_argument("--k", type=int, default=20, help="Neighbours for nearest queries")
+    parser.add_argument("--spread", type=float, default=0.3, help="Std-dev of gym coordinates (degrees)")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed + 1)
+    print(f"{'gyms':>8} {'query':>8} {'scalar ms':>10} {'vector ms':>10} {'grid ms':>10} {'vs scalar':>10}")
+    for size in args.sizes:
+        points = make_points(size, args.spread, args.seed)
+        columns = Columns(points)
+        grid = GridIndex(points)
+        positions = [
+            (CENTER[0] + rng.gauss(0, args.spread), CENTER[1] + rng.gauss(0, args.spread))
+            for _ in range(args.queries)
+        ]
+        within_queries = [(lat, lon, args.radius) for lat, lon in positions]
+        nearest_queries = [(lat, lon, args.k) for lat, lon in positions]
+
+        for lat, lon, radius in within_queries[:3]:
+            expected = scalar_within(points, lat, lon, radius)
+            assert same_results(columns.within(lat, lon, radius), expected)
+            assert same_results(grid.within(lat, lon, radius), expected)
+
+        # Keep the slow scalar loop to a handful of runs on large catalogs
+        repeat = max(1, 20000 // size)
+        for label, scalar, vector, indexed, queries in (
+            ("within", lambda *q: scalar_within(points, *q), columns.within, grid.within, within_queries),
+            ("nearest", lambda *q: scalar_nearest(points, *q), columns.nearest, grid.nearest, nearest_queries),
+        ):
+            scalar_ms = time_queries(scalar, queries, repeat)
+            vector_ms = time_queries(vector, queries, repeat * 10)
+            grid_ms = time_queries(indexed, queries, repeat * 10)
+            print(f"{size:>8} {label:>8} {scalar_ms:>10.3f} {vector_ms:>10.3f} {grid_ms:>10.3f} "
+                  f"{scalar_ms / grid_ms:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
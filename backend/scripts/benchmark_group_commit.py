@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Group-commit throughput benchmark for check-ins and checkouts
+
+Simulates concurrent visitors on one worker. Each visitor repeatedly checks in
+and out through the same write paths the API uses (routes.checkins.apply_checkin
+and apply_checkout), submitted through utils.group_commit.GroupCommitWriter:
+
+  - one-commit-per-request: window 0, every mutation commits on its own
+  - group-commit:           mutations collected for --window-ms and committed together
+
+Usage:
+    python scripts/benchmark_group_commit.py --visitors 64 --visits 20 --window-ms 5
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from database.connection import Base, create_db_engine, create_async_db_engine
+from models.user import User
+from models.gym import Gym
+from routes.checkins import apply_checkin, apply_checkout
+from utils.group_commit import GroupCommitWriter
+import models.admin, models.subscription, models.audit, models.gamification, models.support, models.features  # noqa: F401
+
+
+def seed(database_url: str, visitors: int, gyms: int):
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        for i in range(gyms):
+            db.add(Gym(
+                name=f"Bench Gym {i}",
+                address="Rua do Benchmark, 1 - Centro, São Paulo - SP",
+                phone="(11) 0000-0000",
+                latitude=-23.55,
+                longitude=-46.63,
+                open_hours_weekdays="24 horas",
+                open_hours_weekends="24 horas",
+                max_capacity=1_000_000,
+                current_occupancy=0,
+            ))
+        for i in range(visitors):
+            db.add(User(
+                name=f"Bench User {i}",
+                email=f"bench{i}@unipass.test",
+                phone="(11) 99999-9999",
+                password_hash="x",
+            ))
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+
+
+async def run(name: str, window_ms: int, max_batch: int, visitors: int, visits: int, gyms: int):
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='unipass-gc-'), 'bench.db')}"
+    seed(database_url, visitors, gyms)
+
+    engine = create_async_db_engine(database_url)
+    writer = GroupCommitWriter(
+        async_sessionmaker(engine, autoflush=False, expire_on_commit=False),
+        window_ms=window_ms,
+        max_batch=max_batch
+    )
+    writer.start()
+
+    async def visitor(user_id: int):
+        for n in range(visits):
+            gym_id = (user_id + n) % gyms + 1
+            checkin, _ = await writer.submit(lambda db: apply_checkin(db, user_id, gym_id))
+            await writer.submit(lambda db: apply_checkout(db, user_id, checkin.id))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(visitor(i + 1) for i in range(visitors)))
+    elapsed = time.perf_counter() - started
+    await writer.stop()
+    await engine.dispose()
+
+    writes = visitors * visits * 2
+    commits = writer.batches if window_ms > 0 else writes
+    print(f"{name:<24} {writes:>7} {commits:>8} {elapsed:>9.2f}s {writes / elapsed:>10.1f}")
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Group commit vs one commit per request")
+    parser.add_argument("--visitors", type=int, default=64, help="Concurrent visitors (default: 64)")
+    parser.add_argument("--visits", type=int, default=20, help="Visits per visitor (default: 20)")
+    parser.add_argument("--gyms", type=int, default=4)
+    parser.add_argument("--window-ms", type=int, default=5, help="Group commit window (default: 5)")
+    parser.add_argument("--max-batch", type=int, default=64, help="Group commit batch size (default: 64)")
+    args = parser.parse_args()
+
+    print(f"{args.visitors} visitors x {args.visits} visits (check-in + checkout)")
+    print(f"{'mode':<24} {'writes':>7} {'commits':>8} {'elapsed':>10} {'writes/s':>10}")
+    await run("one-commit-per-request", 0, args.max_batch, args.visitors, args.visits, args.gyms)
+    await run("group-commit", args.window_ms, args.max_batch, args.visitors, args.visits, args.gyms)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Database maintenance script for Unipass
-Handles cleanup, migrations, and data updates
+Handles cleanup, migrations, data updates and index checks
 """
 
 import sys
@@ -9,9 +9,21 @@ import os
 from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database.connection import SessionLocal
+from sqlalchemy import select, func, update
+
+from database.connection import SessionLocal, engine, migrate_db
+from models.user import User
 from models.checkin import CheckIn
 from models.gym import Gym
+from models.subscription import Subscription, Payment, SubscriptionStatus
+from models.audit import AuditLog
+from models.gamification import UserAchievement, UserPoints, PointHistory
+from models.refresh_token import RefreshToken
+from models.revoked_token import RevokedToken
+from models.idempotency_key import IdempotencyKey
+from utils.dates import local_today
+from utils.occupancy import release_slot
+from utils.search import rebuild_search_index, supports_full_text
 
 
 def cleanup_old_checkins(days_to_keep: int = 90):
@@ -36,28 +48,71 @@ def cleanup_old_checkins(days_to_keep: int = 90):
         db.close()
 
 
+def cleanup_refresh_tokens():
+    """Remove expired refresh tokens and revoked access-token ids.
+    
+    Revoked refresh tokens are kept until expiry for reuse detection.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        removed = db.query(RefreshToken).filter(
+            RefreshToken.expires_at < now
+        ).delete(synchronize_session=False)
+        revoked = db.query(RevokedToken).filter(
+            RevokedToken.expires_at < now
+        ).delete(synchronize_session=False)
+        db.commit()
+        print(f"Removed {removed} expired refresh tokens and {revoked} expired revoked token ids")
+        
+    finally:
+        db.close()
+
+
+def cleanup_idempotency_keys():
+    """Remove stored Idempotency-Key responses past their TTL"""
+    db = SessionLocal()
+    try:
+        removed = db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        print(f"Removed {removed} expired idempotency keys")
+        
+    finally:
+        db.close()
+
+
 def force_checkout_stuck_checkins():
     """Force checkout for check-ins older than 4 hours"""
     db = SessionLocal()
     try:
         cutoff_time = datetime.utcnow() - timedelta(hours=4)
-        stuck_checkins = db.query(CheckIn).filter(
+        stuck_checkins = db.query(CheckIn.id, CheckIn.checkin_time).filter(
             CheckIn.is_active == True,
             CheckIn.checkin_time < cutoff_time
         ).all()
         
-        for checkin in stuck_checkins:
-            checkin.is_active = False
-            checkin.checkout_time = checkin.checkin_time + timedelta(hours=4)
+        closed = 0
+        for checkin_id, checkin_time in stuck_checkins:
+            # Close it only if the user has not checked out in the meantime
+            row = db.execute(
+                update(CheckIn)
+                .where(CheckIn.id == checkin_id, CheckIn.is_active == True)
+                .values(checkout_time=checkin_time + timedelta(hours=4), is_active=False)
+                .returning(CheckIn.gym_id)
+                .execution_options(synchronize_session=False)
+            ).first()
+            if row is None:
+                continue
             
             # Update gym occupancy
-            gym = db.query(Gym).filter(Gym.id == checkin.gym_id).first()
-            if gym and gym.current_occupancy > 0:
-                gym.current_occupancy -= 1
+            db.execute(release_slot(row.gym_id))
+            closed += 1
         
-        if stuck_checkins:
+        if closed:
             db.commit()
-            print(f"Force checked out {len(stuck_checkins)} stuck check-ins")
+            print(f"Force checked out {closed} stuck check-ins")
         else:
             print("No stuck check-ins found")
             
@@ -80,24 +135,162 @@ def reset_gym_occupancy():
         db.close()
 
 
+def rebuild_gym_search():
+    """Re-derive the full-text gym index from the gyms table"""
+    if not supports_full_text(engine):
+        print(f"Full-text search is not available on {engine.dialect.name}")
+        return
+    rebuild_search_index(engine)
+    print("Rebuilt the gym search index")
+
+
+def hot_queries():
+    """Representative statements issued by the API routers.
+
+    Each entry is (label, statement, tables allowed to be scanned). Keep this
+    list in sync with the routers so index regressions show up here first.
+    """
+    now = datetime.utcnow()
+    today = local_today()
+    return [
+        ("auth: user by email",
+         select(User).where(User.email == "user@example.com"), ()),
+        ("checkins: active check-in for user",
+         select(CheckIn).where(CheckIn.user_id == 1, CheckIn.is_active == True), ()),
+        ("checkins: user history",
+         select(CheckIn).where(CheckIn.user_id == 1)
+         .order_by(CheckIn.checkin_time.desc()).limit(50), ()),
+        ("gym_admin: active check-ins at gym",
+         select(CheckIn).where(CheckIn.gym_id == 1, CheckIn.is_active == True), ()),
+        ("gym_admin: check-ins this week",
+         select(func.count(CheckIn.id)).where(
+             CheckIn.gym_id == 1, CheckIn.checkin_time >= now - timedelta(days=7)), ()),
+        ("gym_admin: check-ins today",
+         select(func.count(CheckIn.id)).where(
+             CheckIn.gym_id == 1, CheckIn.checkin_date == today), ()),
+        ("gym_admin: daily trend",
+         select(CheckIn.checkin_date, func.count(CheckIn.id)).where(
+             CheckIn.gym_id == 1, CheckIn.checkin_date > today - timedelta(days=7))
+         .group_by(CheckIn.checkin_date), ()),
+        ("admin: check-ins today",
+         select(func.count(CheckIn.id)).where(CheckIn.checkin_date == today), ()),
+        ("admin: daily check-ins",
+         select(CheckIn.checkin_date, func.count(CheckIn.id)).where(
+             CheckIn.checkin_date >= today - timedelta(days=30))
+         .group_by(CheckIn.checkin_date), ()),
+        ("admin: top gyms (30 days)",
+         select(Gym.name, func.count(CheckIn.id)).join(CheckIn)
+         .where(CheckIn.checkin_time >= now - timedelta(days=30))
+         .group_by(Gym.id, Gym.name), ("gyms",)),
+        ("gyms: search within radius",
+         select(Gym).where(
+             Gym.is_active == True,
+             Gym.latitude.between(-23.6, -23.5), Gym.longitude.between(-46.7, -46.6)), ()),
+        ("gamification: yesterday's check-in",
+         select(CheckIn).where(
+             CheckIn.user_id == 1, CheckIn.checkin_date == today - timedelta(days=1)), ()),
+        ("gamification: earned achievements",
+         select(UserAchievement.achievement_id).where(UserAchievement.user_id == 1), ()),
+        ("gamification: point history",
+         select(PointHistory).where(PointHistory.user_points_id == 1)
+         .order_by(PointHistory.created_at.desc()).limit(50), ()),
+        ("gamification: monthly leaderboard",
+         select(UserPoints.user_id, func.sum(PointHistory.points_change))
+         .join(PointHistory).where(PointHistory.created_at >= now.replace(day=1))
+         .group_by(UserPoints.user_id), ("user_points",)),
+        ("subscriptions: active subscription",
+         select(Subscription).where(
+             Subscription.user_id == 1, Subscription.status == SubscriptionStatus.ACTIVE), ()),
+        ("subscriptions: payment history",
+         select(Payment).where(Payment.subscription_id.in_([1, 2]))
+         .order_by(Payment.created_at.desc()).limit(50), ()),
+        # Walks ix_audit_logs_timestamp backwards and stops after LIMIT rows
+        ("admin: audit logs",
+         select(AuditLog).order_by(AuditLog.timestamp.desc()).limit(50), ("audit_logs",)),
+        ("admin: audit logs by action",
+         select(AuditLog).where(AuditLog.action == "FORCE_CHECKOUT")
+         .order_by(AuditLog.timestamp.desc()).limit(50), ()),
+    ]
+
+
+def _full_scans(conn, sql: str):
+    """Return the tables the query plan reads without an index"""
+    if engine.dialect.name == "sqlite":
+        plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+        # "SCAN t USING COVERING INDEX" still reads every row, so it counts as a scan too
+        return [line.split()[1] for line in plan if line.startswith("SCAN ")], plan
+    if engine.dialect.name == "postgresql":
+        plan = [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}")]
+        return [line.split("Seq Scan on ")[1].split()[0] for line in plan if "Seq Scan on " in line], plan
+    raise RuntimeError(f"Index check not supported for {engine.dialect.name}")
+
+
+def check_query_plans(verbose: bool = False) -> int:
+    """EXPLAIN the router queries and report the ones that still scan a table"""
+    regressions = 0
+    with engine.connect() as conn:
+        for label, statement, allowed in hot_queries():
+            sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            scans, plan = _full_scans(conn, sql)
+            unexpected = [table for table in scans if table not in allowed]
+            if unexpected:
+                regressions += 1
+                print(f"SCAN  {label}: {', '.join(unexpected)}")
+            else:
+                print(f"ok    {label}")
+            if verbose or unexpected:
+                for line in plan:
+                    print(f"        {line}")
+
+    print(f"{regressions} of {len(hot_queries())} queries scan without an index")
+    return regressions
+
+
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Unipass Database Maintenance")
     parser.add_argument("--cleanup-checkins", type=int, metavar="DAYS",
                        help="Remove check-ins older than DAYS (default: 90)")
+    parser.add_argument("--cleanup-refresh-tokens", action="store_true",
+                       help="Remove expired refresh tokens and revoked token ids")
+    parser.add_argument("--cleanup-idempotency-keys", action="store_true",
+                       help="Remove stored Idempotency-Key responses past their TTL")
     parser.add_argument("--force-checkout", action="store_true",
                        help="Force checkout stuck check-ins (older than 4 hours)")
     parser.add_argument("--reset-occupancy", action="store_true",
                        help="Reset all gym occupancy to 0 (emergency use)")
+    parser.add_argument("--rebuild-search", action="store_true",
+                       help="Rebuild the full-text gym search index from the gyms table")
+    parser.add_argument("--check-indexes", action="store_true",
+                       help="EXPLAIN the API's hot queries and report any that scan a table")
+    parser.add_argument("--verbose", action="store_true",
+                       help="With --check-indexes, print every query plan")
     
     args = parser.parse_args()
     
+    # The maintenance queries use columns the server adds on startup; add them here too
+    migrate_db()
+    
+    if args.check_indexes:
+        sys.exit(1 if check_query_plans(args.verbose) else 0)
+    
     if args.cleanup_checkins is not None:
         cleanup_old_checkins(args.cleanup_checkins)
-    elif args.cleanup_checkins is None and not any([args.force_checkout, args.reset_occupancy]):
+    elif args.cleanup_checkins is None and not any([args.force_checkout, args.reset_occupancy,
+                                                     args.cleanup_refresh_tokens, args.cleanup_idempotency_keys,
+                                                     args.rebuild_search]):
         cleanup_old_checkins()  # Default cleanup
     
+    if args.cleanup_refresh_tokens:
+        cleanup_refresh_tokens()
+    
+    if args.cleanup_idempotency_keys:
+        cleanup_idempotency_keys()
+    
+    if args.rebuild_search:
+        rebuild_gym_search()
+    
     if args.force_checkout:
         force_checkout_stuck_checkins()
     
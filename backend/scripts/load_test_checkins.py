@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Load test: check-in latency while the admin dashboard is hammered
+
+Starts N threads that request /api/admin/dashboard in a tight loop and, at
+the same time, measures POST /api/checkins/ (followed by a checkout) from a
+separate visitor. Reports p50/p95/p99 check-in latency with and without the
+dashboard load, which shows whether slow admin reports stall the event loop.
+
+Requires the requests package, a running API (uvicorn main:app, started with
+RATE_LIMIT_PER_MINUTE=0 so the limiter does not throttle the load) and two accounts:
+    - a regular user (the visitor)
+    - a super admin (see scripts/create_admin_simple.py)
+
+Usage:
+    python scripts/load_test_checkins.py --user joao@email.com:senha --admin admin@unipass.com:admin123
+"""
+import threading
+import time
+
+import requests
+
+API_BASE = "http://localhost:8000/api"
+
+
+def login(base_url: str, credentials: str) -> dict:
+    email, password = credentials.split(":", 1)
+    response = requests.post(f"{base_url}/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure_checkins(base_url: str, headers: dict, gym_id: int, visits: int) -> list:
+    """Return check-in latencies in milliseconds"""
+    session = requests.Session()
+    session.headers.update(headers)
+
+    # Leave any check-in from a previous run
+    active = session.get(f"{base_url}/checkins/active")
+    if active.status_code == 200:
+        session.post(f"{base_url}/checkins/checkout", json={"checkin_id": active.json()["id"]})
+
+    latencies = []
+    for _ in range(visits):
+        started = time.perf_counter()
+        response = session.post(f"{base_url}/checkins/", json={"gym_id": gym_id})
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        session.post(f"{base_url}/checkins/checkout", json={"checkin_id": response.json()["id"]})
+    return latencies
+
+
+def hammer_dashboard(base_url: str, headers: dict, stop: threading.Event, counter: list):
+    session = requests.Session()
+    session.headers.update(headers)
+    while not stop.is_set():
+        session.get(f"{base_url}/admin/dashboard")
+        counter[0] += 1
+
+
+def report(label: str, latencies: list):
+    print(f"{label:<28} n={len(latencies):<5} "
+          f"p50={percentile(latencies, 50):7.1f}ms "
+          f"p95={percentile(latencies, 95):7.1f}ms "
+          f"p99={percentile(latencies, 99):7.1f}ms "
+          f"max={max(latencies):7.1f}ms")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check-in latency under admin dashboard load")
+    parser.add_argument("--base-url", default=API_BASE)
+    parser.add_argument("--user", required=True, help="Visitor credentials as email:password")
+    parser.add_argument("--admin", required=True, help="Super admin credentials as email:password")
+    parser.add_argument("--gym-id", type=int, default=1)
+    parser.add_argument("--visits", type=int, default=200, help="Check-ins per phase (default: 200)")
+    parser.add_argument("--dashboard-threads", type=int, default=8,
+                        help="Concurrent dashboard clients (default: 8)")
+    args = parser.parse_args()
+
+    user_headers = login(args.base_url, args.user)
+    admin_headers = login(args.base_url, args.admin)
+
+    report("check-in (idle)", measure_checkins(args.base_url, user_headers, args.gym_id, args.visits))
+
+    stop = threading.Event()
+    dashboard_requests = [0]
+    hammers = [
+        threading.Thread(target=hammer_dashboard, args=(args.base_url, admin_headers, stop, dashboard_requests))
+        for _ in range(args.dashboard_threads)
+    ]
+    for thread in hammers:
+        thread.start()
+    try:
+        loaded = measure_checkins(args.base_url, user_headers, args.gym_id, args.visits)
+    finally:
+        stop.set()
+        for thread in hammers:
+            thread.join()
+
+    report("check-in (dashboard load)", loaded)
+    print(f"dashboard requests served during load phase: {dashboard_requests[0]}")
+
+
+if __name__ == "__main__":
+    main()
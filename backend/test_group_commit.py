@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Script para testar se um lote do GroupCommitWriter é um único commit atômico no SQLite
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+
+from fastapi import HTTPException
+from sqlalchemy import Column, Integer, MetaData, Table, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.connection import create_async_db_engine
+from utils.group_commit import GroupCommitWriter
+
+metadata = MetaData()
+visits = Table("visits", metadata, Column("id", Integer, primary_key=True))
+
+
+def committed_ids(path):
+    """Rows another connection can read (only committed data)"""
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT id FROM visits ORDER BY id")]
+    finally:
+        conn.close()
+
+
+async def run_batch(path):
+    engine = create_async_db_engine(f"sqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+
+    seen_before_commit = []
+
+    def visit(visit_id):
+        async def mutation(db):
+            await db.execute(insert(visits).values(id=visit_id))
+            seen_before_commit.append(committed_ids(path))
+            return visit_id
+        return mutation
+
+    async def full_gym(db):
+        await db.execute(insert(visits).values(id=99))
+        raise HTTPException(status_code=400, detail="Gym is at full capacity")
+
+    writer = GroupCommitWriter(async_sessionmaker(engine, expire_on_commit=False), window_ms=50)
+    writer.start()
+    try:
+        results = await asyncio.gather(
+            writer.submit(visit(1)),
+            writer.submit(full_gym),
+            writer.submit(visit(2)),
+            writer.submit(visit(3)),
+            return_exceptions=True
+        )
+    finally:
+        await writer.stop()
+        await engine.dispose()
+    return results, seen_before_commit, writer.batches
+
+
+def test_batch_commits_once():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "group_commit.db")
+        results, seen_before_commit, batches = asyncio.run(run_batch(path))
+
+        assert batches == 1
+        assert results[0] == 1 and results[2] == 2 and results[3] == 3
+        assert isinstance(results[1], HTTPException)
+        # No other connection sees any of the batch until its single commit
+        assert seen_before_commit == [[], [], []]
+        # The failed mutation rolled back to its savepoint only
+        assert committed_ids(path) == [1, 2, 3]
+
+
+if __name__ == "__main__":
+    print("🧪 Testando group commit...")
+    test_batch_commits_once()
+    print("   ✅ Lote invisível para outras conexões até um único commit")
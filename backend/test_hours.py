@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Script para testar a leitura dos horários de funcionamento e o cálculo de is_open_now
+"""
+from datetime import datetime
+
+from utils.hours import parse_hours, weekly_schedule
+
+# Week of Monday 2026-10-12; naive datetimes are local time
+MON, TUE, FRI, SAT, SUN = 12, 13, 16, 17, 18
+
+PARSE_CASES = [
+    ("6h às 22h", [(360, 1320)]),
+    ("6h30 - 22h", [(390, 1320)]),
+    ("05:30-23:00", [(330, 1380)]),
+    ("6h às 12h e 14h às 20h", [(360, 720), (840, 1200)]),
+    ("24 horas", [(0, 1440)]),
+    ("Fechado", []),
+    ("fechada", []),
+    ("22h às 2h", [(1320, 1560)]),  # Past midnight: the end exceeds 1440
+    ("18h às 0h", [(1080, 1440)]),
+    ("Sob consulta", None),
+    ("25h às 3h", None),
+    ("", None),
+    (None, None),
+]
+
+# (weekday hours, weekend hours, day, hour, minute, open?)
+SCHEDULE_CASES = [
+    ("6h às 22h", "8h às 18h", MON, 5, 59, False),
+    ("6h às 22h", "8h às 18h", MON, 6, 0, True),
+    ("6h às 22h", "8h às 18h", FRI, 21, 59, True),
+    ("6h às 22h", "8h às 18h", FRI, 22, 0, False),
+    ("6h às 22h", "8h às 18h", SAT, 7, 59, False),
+    ("6h às 22h", "8h às 18h", SUN, 17, 59, True),
+    ("6h às 12h e 14h às 20h", "Fechado", TUE, 13, 0, False),
+    ("6h às 12h e 14h às 20h", "Fechado", TUE, 14, 0, True),
+    ("6h às 12h e 14h às 20h", "Fechado", SAT, 10, 0, False),
+    # Overnight weekday hours spill into the next morning only
+    ("18h às 2h", "Fechado", FRI, 23, 0, True),
+    ("18h às 2h", "Fechado", SAT, 1, 59, True),
+    ("18h às 2h", "Fechado", SAT, 2, 0, False),
+    ("18h às 2h", "Fechado", MON, 1, 0, False),  # Sunday is closed
+    ("18h às 2h", "Fechado", TUE, 1, 0, True),
+    # Sunday night wraps around to Monday morning
+    ("8h às 20h", "20h às 4h", SUN, 23, 0, True),
+    ("8h às 20h", "20h às 4h", MON, 3, 59, True),
+    ("8h às 20h", "20h às 4h", MON, 4, 0, False),
+    ("8h às 20h", "20h às 4h", SAT, 3, 0, False),  # Friday ends at 20h
+    ("8h às 20h", "20h às 4h", SUN, 3, 0, True),
+    ("24 horas", "24 horas", SUN, 23, 59, True),
+    # Unreadable hours keep the old behaviour: always open
+    ("Sob consulta", "8h às 12h", SAT, 3, 0, True),
+]
+
+
+def test_parse_hours():
+    for text, expected in PARSE_CASES:
+        assert parse_hours(text) == expected, (text, parse_hours(text), expected)
+
+
+def test_weekly_schedule():
+    for weekdays, weekends, day, hour, minute, expected in SCHEDULE_CASES:
+        schedule = weekly_schedule(weekdays, weekends)
+        moment = datetime(2026, 10, day, hour, minute)
+        assert schedule.is_open_at(moment) == expected, (weekdays, weekends, moment, expected)
+
+
+def test_unreadable_hours_are_unknown():
+    assert not weekly_schedule("Sob consulta", "8h às 12h").known
+    assert weekly_schedule("6h às 22h", "Fechado").known
+
+
+if __name__ == "__main__":
+    print("🧪 Testando horários de funcionamento...")
+    test_parse_hours()
+    print(f"   ✅ {len(PARSE_CASES)} formatos de horário")
+    test_weekly_schedule()
+    print(f"   ✅ {len(SCHEDULE_CASES)} consultas de is_open_now")
+    test_unreadable_hours_are_unknown()
+    print("   ✅ Horários ilegíveis tratados como sempre aberto")
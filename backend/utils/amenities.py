@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .autocomplete import normalize
+
+
+def amenity_id(label: str) -> str:
+    """Stable id for an amenity label: "WiFi Grátis" and "Wifi Grátis" are both "wifi-gratis" """
+    return "-".join(normalize(label).split())
+
+
+def split_amenities(text: Optional[str]) -> List[str]:
+    return [label.strip() for label in (text or "").split(",") if label.strip()]
+
+
+class AmenityDictionary:
+    """Interned amenity ids, each with a bit position and a display label.
+
+    Ids are assigned bits in the order they are first seen and never
+    reassigned, so masks stay valid for the life of the worker. The label
+    shown for an id is the first spelling seen.
+    """
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._labels: List[str] = []
+        self._ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def intern(self, label: str) -> Optional[int]:
+        key = amenity_id(label)
+        if not key:
+            return None
+        bit = self._bits.get(key)
+        if bit is None:
+            bit = self._bits[key] = len(self._ids)
+            self._ids.append(key)
+            self._labels.append(label.strip())
+        return bit
+
+    def mask(self, text: Optional[str]) -> int:
+        """Bitmask of a gym's comma-separated amenities, interning new ones"""
+        mask = 0
+        for label in split_amenities(text):
+            bit = self.intern(label)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def lookup(self, keys: Iterable[str]) -> Optional[int]:
+        """Bitmask of the given ids or labels; None if any of them is unknown"""
+        mask = 0
+        for key in keys:
+            bit = self._bits.get(amenity_id(key))
+            if bit is None:
+                return None
+            mask |= 1 << bit
+        return mask
+
+    def entry(self, bit: int) -> Tuple[str, str]:
+        """(id, label) of a bit position"""
+        return self._ids[bit], self._labels[bit]
+
+
+def mask_words(mask: int, words: int) -> np.ndarray:
+    """A Python int bitmask as `words` little-endian uint64 words"""
+    return np.array([(mask >> (64 * word)) & 0xFFFFFFFFFFFFFFFF for word in range(words)], dtype=np.uint64)
+
+
+amenity_dictionary = AmenityDictionary()
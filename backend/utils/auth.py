@@ -1,30 +1,100 @@
+import hashlib
+import hmac
+import secrets
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from functools import cached_property
+from typing import Optional, Tuple, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.connection import get_db
+from database.connection import get_async_db
 from models.user import User
+from models.admin import AdminUser, UserRole, PERMISSION_BITS
+from models.refresh_token import RefreshToken
 from schemas.user import TokenData
 
 # Import secure configuration
+from .cache import TTLCache
 from .config import settings
+from .etag import fingerprint, strong_etag
+from .passwords import PasswordHasher
+from .revocation import revocation_list
 
 # Configuration from secure settings
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT
+)
 
 # Security
 security = HTTPBearer()
 
 
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only copy of the columns routes use from the authenticated user"""
+    id: int
+    name: str
+    email: str
+    phone: str
+    is_active: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            name=user.name,
+            email=user.email,
+            phone=user.phone,
+            is_active=user.is_active,
+            created_at=user.created_at
+        )
+
+    @cached_property
+    def etag(self) -> str:
+        """Strong ETag of the profile served from this snapshot"""
+        return strong_etag(fingerprint(repr(
+            (self.id, self.name, self.email, self.phone, self.is_active, self.created_at)
+        ).encode()))
+
+
+# Authenticated users keyed by token subject (email), per worker
+user_cache = TTLCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_cached_user(email: str):
+    """Drop a cached user; call after changing any UserSnapshot field"""
+    user_cache.pop(email)
+
+
+async def load_user_snapshot(db: AsyncSession, email: str) -> Optional[UserSnapshot]:
+    snapshot = user_cache.get(email)
+    if snapshot is None:
+        user = await db.scalar(select(User).where(User.email == email))
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        user_cache.set(email, snapshot)
+    return snapshot
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -33,11 +103,11 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Union[User, bool]:
-    user = db.query(User).filter(User.email == email).first()
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Union[User, bool]:
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         return False
     return user
 
@@ -48,15 +118,127 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    to_encode.setdefault("jti", secrets.token_hex(16))
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def _hash_refresh_secret(secret: str) -> str:
+    # The secret is 256 random bits, so a fast hash is enough (no bcrypt)
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def create_refresh_token(user_id: int, family_id: Optional[str] = None) -> Tuple[RefreshToken, str]:
+    """Return a new (unsaved) refresh token row and the "<id>.<secret>" string for the client"""
+    token_id = secrets.token_hex(16)
+    secret = secrets.token_urlsafe(32)
+    refresh_token = RefreshToken(
+        id=token_id,
+        user_id=user_id,
+        family_id=family_id or token_id,
+        token_hash=_hash_refresh_secret(secret),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return refresh_token, f"{token_id}.{secret}"
+
+
+def parse_refresh_token(token: str) -> Optional[Tuple[str, str]]:
+    token_id, _, secret = token.partition(".")
+    if len(token_id) != 32 or not secret:
+        return None
+    return token_id, secret
+
+
+def refresh_token_matches(refresh_token: RefreshToken, secret: str) -> bool:
+    return hmac.compare_digest(refresh_token.token_hash, _hash_refresh_secret(secret))
+
+
+def access_token_claims(user: User, admin_user: Optional[AdminUser] = None) -> dict:
+    """Claims for a new access token; admin role, gym and permissions ride along"""
+    claims = {"sub": user.email, "uid": user.id, "role": UserRole.USER.value}
+    if admin_user is not None and admin_user.is_active:
+        claims.update({
+            "role": admin_user.role.value,
+            "gym_id": admin_user.gym_id,
+            "perms": admin_user.permission_mask
+        })
+    return claims
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    """Verified access-token claims; stands in for AdminUser in admin routes"""
+    email: str
+    user_id: int
+    role: UserRole
+    gym_id: Optional[int]
+    permissions: int
+    issued_at: float
+
+    def has_permission(self, permission: str) -> bool:
+        if self.role == UserRole.SUPER_ADMIN:
+            return True
+        return bool(self.permissions & PERMISSION_BITS.get(permission, 0))
+
+    def can_manage_gym(self, gym_id: int) -> bool:
+        if self.role == UserRole.SUPER_ADMIN:
+            return True
+        return self.role == UserRole.GYM_ADMIN and self.gym_id == gym_id
+
+
+async def get_token_claims(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> TokenClaims:
+    """Resolve the caller from the signed token alone (no database access)"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    try:
+        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        claims = TokenClaims(
+            email=payload["sub"],
+            user_id=int(payload["uid"]),
+            role=UserRole(payload["role"]),
+            gym_id=payload.get("gym_id"),
+            permissions=int(payload.get("perms", 0)),
+            issued_at=float(payload["iat"])
+        )
+    except (JWTError, KeyError, ValueError, TypeError):
+        # Includes tokens issued before role claims existed: log in again
+        raise credentials_exception
+    
+    if revocation_list.is_revoked(payload.get("jti"), claims.user_id, claims.issued_at):
+        raise credentials_exception
+    return claims
+
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """Verified claims of an access token, or None if it is invalid or expired"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
+def token_subject(authorization: Optional[str]) -> Optional[str]:
+    """Return the verified `sub` of an "Authorization: Bearer" header value, or None"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_access_token(token)
+    return payload.get("sub") if payload else None
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> UserSnapshot:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -72,16 +254,16 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
+    user = await load_user_snapshot(db, token_data.email)
+    if user is None or revocation_list.is_revoked(payload.get("jti"), user.id, payload.get("iat")):
         raise credentials_exception
     return user
 
 
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[UserSnapshot]:
     if not credentials:
         return None
     
@@ -91,13 +273,15 @@ async def get_current_user_optional(
         if email is None:
             return None
         
-        user = db.query(User).filter(User.email == email).first()
+        user = await load_user_snapshot(db, email)
+        if user is None or revocation_list.is_revoked(payload.get("jti"), user.id, payload.get("iat")):
+            return None
         return user
     except JWTError:
         return None
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: UserSnapshot = Depends(get_current_user)) -> UserSnapshot:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
@@ -0,0 +1,231 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words: accents stripped, punctuation turned into spaces"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    ascii_text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", ascii_text.lower()).strip()
+
+
+def neighborhood(address: str) -> Optional[str]:
+    """Neighborhood from addresses shaped like "Rua X, 123 - Bairro, Cidade - UF" """
+    parts = (address or "").split(" - ")
+    if len(parts) < 3:
+        return None
+    name = parts[1].split(",")[0].strip()
+    return name or None
+
+
+def trigrams(word: str) -> Set[str]:
+    # Padded at the start only: queries are prefixes, so their end is not a word end
+    padded = f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance(query: str, word: str, max_edits: int) -> Optional[int]:
+    """Fewest edits turning `query` into some prefix of `word`, if at most `max_edits`.
+
+    Edits are insertions, deletions, substitutions and swaps of two adjacent
+    letters (optimal string alignment distance).
+    """
+    before = None
+    previous = list(range(len(word) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i] + [0] * len(word)
+        for j, word_char in enumerate(word, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (query_char != word_char)
+            )
+            if before is not None and j > 1 and query_char == word[j - 2] and query[i - 2] == word_char:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > max_edits:
+            return None
+        before, previous = previous, current
+    best = min(previous)
+    return best if best <= max_edits else None
+
+
+def max_edits_for(word: str) -> int:
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+class _TrieNode:
+    __slots__ = ("children", "gyms")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.gyms: Dict[int, int] = {}  # gym id -> number of its words below this node
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    id: int
+    name: str
+    neighborhood: Optional[str]
+    address: str
+
+
+class AutocompleteIndex:
+    """Search-as-you-type over gym names and neighborhoods.
+
+    Every word of a gym's name and neighborhood goes into a prefix trie whose
+    nodes know which gyms lie below them, so an exact prefix costs one walk
+    down the trie. For typos, a trigram index narrows the vocabulary to words
+    sharing a trigram with the query, and only those are checked with a
+    bounded edit distance (1 edit up to 5 letters, 2 beyond). Gyms can be
+    added and removed one at a time; `sync` applies the difference to a new
+    catalog snapshot.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._word_gyms: Dict[str, Set[int]] = {}
+        self._gyms: Dict[int, Tuple[Suggestion, Tuple[str, ...], float]] = {}
+        self._synced = None
+        self._order: Optional[Tuple[List[int], Dict[int, int]]] = None
+
+    def __len__(self) -> int:
+        return len(self._gyms)
+
+    def add(self, gym_id: int, name: str, address: str, rating: float = 0.0):
+        if gym_id in self._gyms:
+            self.remove(gym_id)
+        area = neighborhood(address)
+        words = tuple(dict.fromkeys(normalize(f"{name} {area or ''}").split()))
+        self._gyms[gym_id] = (Suggestion(gym_id, name, area, address), words, rating or 0.0)
+        self._order = None
+        for word in words:
+            node = self._root
+            for char in word:
+                node = node.children.setdefault(char, _TrieNode())
+                node.gyms[gym_id] = node.gyms.get(gym_id, 0) + 1
+            gyms = self._word_gyms.setdefault(word, set())
+            if not gyms:
+                for trigram in trigrams(word):
+                    self._trigrams.setdefault(trigram, set()).add(word)
+            gyms.add(gym_id)
+
+    def remove(self, gym_id: int):
+        entry = self._gyms.pop(gym_id, None)
+        if entry is None:
+            return
+        self._order = None
+        for word in entry[1]:
+            node = self._root
+            for char in word:
+                parent, node = node, node.children[char]
+                count = node.gyms[gym_id] - 1
+                if count:
+                    node.gyms[gym_id] = count
+                else:
+                    del node.gyms[gym_id]
+                if not node.gyms:
+                    del parent.children[char]
+                    break
+            gyms = self._word_gyms[word]
+            gyms.discard(gym_id)
+            if not gyms:
+                del self._word_gyms[word]
+                for trigram in trigrams(word):
+                    words = self._trigrams[trigram]
+                    words.discard(word)
+                    if not words:
+                        del self._trigrams[trigram]
+
+    def sync(self, catalog):
+        """Bring the index in line with a GymCatalog, touching only changed gyms"""
+        if catalog is self._synced:
+            return
+        for gym_id in [gym_id for gym_id in self._gyms if catalog.get(gym_id) is None]:
+            self.remove(gym_id)
+        for gym in catalog.gyms:
+            entry = self._gyms.get(gym.id)
+            if entry is None or (entry[0].name, entry[0].address, entry[2]) != (gym.name, gym.address, gym.rating):
+                self.add(gym.id, gym.name, gym.address, gym.rating)
+        self._synced = catalog
+
+    def _matches(self, word: str) -> Dict[int, int]:
+        """gym id -> edits needed for `word` to prefix one of the gym's words"""
+        found: Dict[int, int] = {}
+        node = self._root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            found = dict.fromkeys(node.gyms, 0)
+
+        max_edits = max_edits_for(word)
+        if max_edits:
+            # Each edit destroys at most 3 trigrams, so a close word keeps the rest
+            query_trigrams = trigrams(word)
+            shared: Dict[str, int] = {}
+            for trigram in query_trigrams:
+                for candidate in self._trigrams.get(trigram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            needed = max(1, len(query_trigrams) - 3 * max_edits)
+            for candidate, count in shared.items():
+                if count < needed:
+                    continue
+                edits = prefix_distance(word, candidate, max_edits)
+                if edits:
+                    for gym_id in self._word_gyms[candidate]:
+                        if edits < found.get(gym_id, max_edits + 1):
+                            found[gym_id] = edits
+        return found
+
+    def search(self, query: str, limit: int = 10) -> List[Suggestion]:
+        """Gyms matching every typed word, fewest edits first, then by rating and name"""
+        words = normalize(query).split()
+        if not words:
+            return []
+        costs: Optional[Dict[int, int]] = None
+        for word in words:
+            matches = self._matches(word)
+            if costs is None:
+                costs = matches
+            else:
+                costs = {gym_id: cost + matches[gym_id] for gym_id, cost in costs.items() if gym_id in matches}
+            if not costs:
+                return []
+
+        order, position = self._ranking()
+        if len(costs) * 8 < len(order):
+            ranked = sorted(costs, key=lambda gym_id: (costs[gym_id], position[gym_id]))
+        else:
+            # Short prefixes match most gyms: walk the global ranking instead of sorting them
+            buckets: Dict[int, List[int]] = {}
+            for gym_id in order:
+                cost = costs.get(gym_id)
+                if cost is None:
+                    continue
+                bucket = buckets.setdefault(cost, [])
+                bucket.append(gym_id)
+                if cost == 0 and len(bucket) >= limit:
+                    break
+            ranked = [gym_id for cost in sorted(buckets) for gym_id in buckets[cost]]
+        return [self._gyms[gym_id][0] for gym_id in ranked[:limit]]
+
+    def _ranking(self) -> Tuple[List[int], Dict[int, int]]:
+        """Gym ids by rating then name, and each id's position in that order"""
+        if self._order is None:
+            order = sorted(self._gyms, key=lambda gym_id: (-self._gyms[gym_id][2], self._gyms[gym_id][0].name))
+            self._order = (order, {gym_id: index for index, gym_id in enumerate(order)})
+        return self._order
+
+    def stats(self) -> Dict[str, int]:
+        return {"gyms": len(self._gyms), "words": len(self._word_gyms), "trigrams": len(self._trigrams)}
+
+
+gym_autocomplete = AutocompleteIndex()
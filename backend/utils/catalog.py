@@ -0,0 +1,392 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.connection import AsyncSessionLocal
+from models.gym import Gym
+from models.subscription import Plan
+from schemas.gym import GymResponse
+from .amenities import amenity_dictionary, mask_words
+from .config import settings
+from .etag import fingerprint, strong_etag
+from .geo import GridIndex
+from .hours import SCHEDULE_BYTES, WeeklySchedule, minute_of_week, weekly_schedule
+from .occupancy import get_occupancy_store, live_occupancy, occupancy_percentage
+
+T = TypeVar("T")
+
+
+def dump_json(content: Any) -> bytes:
+    """Serialize like FastAPI's JSONResponse does"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class GymEntry:
+    """Immutable copy of one active gym row, safe to share between requests"""
+    id: int
+    name: str
+    address: str
+    phone: str
+    latitude: float
+    longitude: float
+    open_hours_weekdays: str
+    open_hours_weekends: str
+    amenities: Optional[str]
+    description: Optional[str]
+    max_capacity: int
+    current_occupancy: int
+    rating: float
+    total_reviews: int
+    is_active: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_gym(cls, gym: Gym) -> "GymEntry":
+        return cls(
+            id=gym.id,
+            name=gym.name,
+            address=gym.address,
+            phone=gym.phone,
+            latitude=gym.latitude,
+            longitude=gym.longitude,
+            open_hours_weekdays=gym.open_hours_weekdays,
+            open_hours_weekends=gym.open_hours_weekends,
+            amenities=gym.amenities,
+            description=gym.description,
+            max_capacity=gym.max_capacity or 0,
+            current_occupancy=gym.current_occupancy or 0,
+            rating=gym.rating or 0.0,
+            total_reviews=gym.total_reviews or 0,
+            is_active=bool(gym.is_active),
+            created_at=gym.created_at
+        )
+
+    @property
+    def amenities_list(self) -> List[str]:
+        return self.amenities.split(',') if self.amenities else []
+
+    @property
+    def occupancy_percentage(self) -> float:
+        return occupancy_percentage(self.current_occupancy, self.max_capacity)
+
+    @property
+    def schedule(self) -> WeeklySchedule:
+        return weekly_schedule(self.open_hours_weekdays, self.open_hours_weekends)
+
+    @property
+    def is_open_now(self) -> bool:
+        return self.is_active and self.schedule.is_open(minute_of_week())
+
+
+# Facet bands. Occupancy matches the colors of the gym page (<=60% green,
+# <=80% yellow, above red); gyms without reviews are "unrated" whatever their rating.
+OCCUPANCY_BANDS = ("low", "moderate", "high")
+OCCUPANCY_BAND_EDGES = (60.0, 80.0)
+RATING_BANDS = ("below_3", "3_to_4", "4_to_4.5", "4.5_plus", "unrated")
+RATING_BAND_EDGES = (3.0, 4.0, 4.5)
+
+
+# Fields that change with every check-in or with the clock; they are appended per request
+_LIVE_FIELDS = {"current_occupancy", "max_capacity", "occupancy_percentage", "is_open_now"}
+
+
+def _open_object(content: dict) -> bytes:
+    """JSON for `content` without its closing brace, so more fields can follow"""
+    return dump_json(content)[:-1]
+
+
+def _live_fields(gym: GymEntry, minute: int) -> bytes:
+    occupancy, capacity = live_occupancy(gym)
+    return b',"is_open_now":%s,"current_occupancy":%d,"max_capacity":%d,"occupancy_percentage":%s}' % (
+        b"true" if gym.schedule.is_open(minute) else b"false",
+        occupancy, capacity, dump_json(float(occupancy_percentage(occupancy, capacity)))
+    )
+
+
+class GymCatalog:
+    """Snapshot of the active gyms with a spatial index over their coordinates.
+
+    Everything that only changes when a gym is edited is serialized once per
+    snapshot; responses are assembled from those bytes plus the live
+    occupancy and open/closed state of each gym. Opening hours are compiled
+    into one row of minute bits per gym, so "open at" filters test a single
+    column for the whole catalog.
+    """
+
+    def __init__(self, gyms: Sequence[GymEntry]):
+        self.gyms: Tuple[GymEntry, ...] = tuple(sorted(gyms, key=lambda gym: gym.id))
+        self.by_id: Dict[int, GymEntry] = {gym.id: gym for gym in self.gyms}
+        self.grid = GridIndex([(gym.id, gym.latitude, gym.longitude) for gym in self.gyms])
+        self._hours = np.frombuffer(
+            b"".join(gym.schedule.bitmap for gym in self.gyms), dtype=np.uint8
+        ).reshape(len(self.gyms), SCHEDULE_BYTES)
+        # Amenities as a bitmask per gym, in uint64 words (bit = amenity_dictionary position)
+        masks = [amenity_dictionary.mask(gym.amenities) for gym in self.gyms]
+        self._amenity_words = max(1, (len(amenity_dictionary) + 63) // 64)
+        self._amenities = np.array(
+            [mask_words(mask, self._amenity_words) for mask in masks], dtype=np.uint64
+        ).reshape(len(self.gyms), self._amenity_words)
+        self._ids = np.array([gym.id for gym in self.gyms], dtype=np.int64)
+        self._ratings = np.array([gym.rating for gym in self.gyms], dtype=np.float64)
+        self._reviews = np.array([gym.total_reviews for gym in self.gyms], dtype=np.int64)
+        self._occupancy = np.array([gym.current_occupancy for gym in self.gyms], dtype=np.int64)
+        self._capacity = np.array([gym.max_capacity for gym in self.gyms], dtype=np.int64)
+        self._detail_json: Dict[int, bytes] = {}
+        self._summary_json: Dict[int, bytes] = {}
+        for gym in self.gyms:
+            detail = GymResponse.model_validate(gym).model_dump(mode="json", exclude=_LIVE_FIELDS)
+            self._detail_json[gym.id] = _open_object(detail)
+            self._summary_json[gym.id] = _open_object({
+                "id": gym.id,
+                "name": gym.name,
+                "address": gym.address,
+                "rating": gym.rating
+            })
+        # Identifies the static part of every response built from this snapshot,
+        # the same in every worker holding the same rows
+        self.fingerprint = fingerprint(
+            *self._detail_json.values(), self._occupancy.tobytes(), self._capacity.tobytes()
+        )
+
+    def get(self, gym_id: int) -> Optional[GymEntry]:
+        return self.by_id.get(gym_id)
+
+    def open_mask(self, minute: int) -> np.ndarray:
+        """Which gyms (in `gyms` order) are open at a local minute of the week"""
+        return (self._hours[:, minute >> 3] >> (minute & 7) & 1).astype(bool)
+
+    def amenity_mask(self, keys: Sequence[str]) -> np.ndarray:
+        """Which gyms have every amenity in `keys` (ids or labels)"""
+        required = amenity_dictionary.lookup(keys)
+        if required is None or required >> (64 * self._amenity_words):
+            # Unknown to this snapshot, so no gym in it has the amenity
+            return np.zeros(len(self.gyms), dtype=bool)
+        words = mask_words(required, self._amenity_words)
+        return ((self._amenities & words) == words).all(axis=1)
+
+    def nearby_mask(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Which gyms lie within `radius_km` of (lat, lon)"""
+        return np.isin(self._ids, [gym_id for _, gym_id in self.grid.within(lat, lon, radius_km)])
+
+    def facets(self, allowed: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Counts per amenity, occupancy band and rating band over the `allowed` gyms"""
+        if allowed is None:
+            allowed = np.ones(len(self.gyms), dtype=bool)
+
+        # One AND + popcount-style count per amenity over the selected gyms' words
+        selected = self._amenities[allowed]
+        amenities = []
+        for bit in range(min(len(amenity_dictionary), 64 * self._amenity_words)):
+            count = int(np.count_nonzero(selected[:, bit >> 6] & np.uint64(1 << (bit & 63))))
+            if count:
+                key, label = amenity_dictionary.entry(bit)
+                amenities.append({"id": key, "label": label, "count": count})
+        amenities.sort(key=lambda facet: (-facet["count"], facet["label"]))
+
+        occupancy, capacity, tracked = get_occupancy_store().get_many(self._ids[allowed])
+        occupancy = np.where(tracked, occupancy, self._occupancy[allowed])
+        capacity = np.where(tracked, capacity, self._capacity[allowed])
+        percentage = np.divide(occupancy * 100.0, capacity, out=np.zeros(len(capacity)), where=capacity > 0)
+        # Band index = number of edges passed; cheaper than np.digitize for a few edges
+        occupancy_bands = sum((percentage > edge).view(np.int8) for edge in OCCUPANCY_BAND_EDGES)
+
+        ratings = self._ratings[allowed]
+        rating_bands = np.where(
+            self._reviews[allowed] > 0,
+            sum((ratings >= edge).view(np.int8) for edge in RATING_BAND_EDGES),
+            len(RATING_BANDS) - 1
+        )
+
+        occupancy_counts = np.bincount(occupancy_bands, minlength=len(OCCUPANCY_BANDS)).tolist()
+        rating_counts = np.bincount(rating_bands, minlength=len(RATING_BANDS)).tolist()
+        return {
+            "total": int(np.count_nonzero(allowed)),
+            "amenities": amenities,
+            "occupancy": dict(zip(OCCUPANCY_BANDS, occupancy_counts)),
+            "rating": dict(zip(RATING_BANDS, rating_counts))
+        }
+
+    def first(self, limit: int, allowed: Optional[np.ndarray] = None) -> List[GymEntry]:
+        """The first `limit` gyms by id, optionally only those in the `allowed` mask"""
+        if allowed is None:
+            return list(self.gyms[:limit])
+        return [self.gyms[index] for index in np.flatnonzero(allowed)[:limit].tolist()]
+
+    def within(
+        self, lat: float, lon: float, radius_km: float, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, GymEntry]]:
+        """Gyms within `radius_km`, nearest first, as (distance_km, gym)"""
+        return [
+            (distance, self.by_id[gym_id])
+            for distance, gym_id in self.grid.within(lat, lon, radius_km, allowed)
+        ]
+
+    def nearest(
+        self, lat: float, lon: float, k: int, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, GymEntry]]:
+        """The `k` gyms closest to (lat, lon), nearest first, as (distance_km, gym)"""
+        return [(distance, self.by_id[gym_id]) for distance, gym_id in self.grid.nearest(lat, lon, k, allowed)]
+
+    def box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Ids of the gyms inside a latitude/longitude rectangle"""
+        return self.grid.box(min_lat, min_lon, max_lat, max_lon)
+
+    def etag(self, gyms: Sequence[GymEntry], minute: int) -> str:
+        """Strong ETag for a response about `gyms` (in order) at `minute` of the week.
+
+        Combines the snapshot fingerprint with the gyms' live occupancy words
+        and open bits, so it changes exactly when the body would, without
+        serializing the body.
+        """
+        ids = np.array([gym.id for gym in gyms], dtype=np.int64)
+        occupancy, capacity, tracked = get_occupancy_store().get_many(ids)
+        is_open = self._hours[np.searchsorted(self._ids, ids), minute >> 3] >> (minute & 7) & 1
+        live = fingerprint(ids.tobytes(), occupancy.tobytes(), capacity.tobytes(), tracked.tobytes(), is_open.tobytes())
+        return strong_etag(self.fingerprint, live)
+
+    def detail_json(self, gym: GymEntry, minute: int) -> bytes:
+        """GymResponse body with live occupancy and open state at `minute` of the week"""
+        return self._detail_json[gym.id] + _live_fields(gym, minute)
+
+    def summary_json(self, matches: Sequence[Tuple[Optional[float], GymEntry]], minute: int) -> bytes:
+        """List of GymSearchResponse bodies for (distance_km or None, gym) pairs"""
+        parts = []
+        for distance, gym in matches:
+            distance_json = b"null" if distance is None else dump_json(round(distance, 2))
+            parts.append(self._summary_json[gym.id] + b',"distance":' + distance_json + _live_fields(gym, minute))
+        return b"[" + b",".join(parts) + b"]"
+
+
+class PlanCatalog:
+    """Snapshot of the active plans and their serialized listing"""
+
+    def __init__(self, plans: Sequence[Plan]):
+        self.plans = [
+            {
+                "id": plan.id,
+                "name": plan.name,
+                "description": plan.description,
+                "plan_type": plan.plan_type.value,
+                "price_monthly": plan.price_monthly,
+                "price_yearly": plan.price_yearly,
+                "max_checkins_per_month": plan.max_checkins_per_month,
+                "max_gyms_access": plan.max_gyms_access,
+                "features": plan.features_list,
+                "savings_yearly": (plan.price_monthly * 12 - plan.price_yearly) if plan.price_yearly else 0
+            }
+            for plan in plans
+        ]
+        self.body = dump_json(self.plans)
+        self.etag = strong_etag(fingerprint(self.body))
+
+
+_caches: List["SnapshotCache"] = []
+
+
+class SnapshotCache(Generic[T]):
+    """One immutable snapshot per worker, rebuilt from the database on demand.
+
+    A commit that changes any of `models` through the ORM in this worker
+    invalidates the snapshot immediately (see the Session hooks below).
+    Changes made by other workers or scripts are picked up once the snapshot
+    is older than `ttl_seconds`. Concurrent requests for a stale snapshot
+    share a single rebuild.
+    """
+
+    def __init__(self, models: tuple, load: Callable[[AsyncSession], Awaitable[T]], ttl_seconds: float):
+        self.models = models
+        self.ttl = ttl_seconds
+        self._load = load
+        self._lock = asyncio.Lock()
+        self._snapshot: Optional[T] = None
+        self._snapshot_version = -1
+        self._built_at = 0.0
+        self.version = 0
+        self.builds = 0
+        _caches.append(self)
+
+    def invalidate(self):
+        self.version += 1
+
+    def _current(self) -> Optional[T]:
+        if self._snapshot_version != self.version or time.monotonic() - self._built_at >= self.ttl:
+            return None
+        return self._snapshot
+
+    async def get(self) -> T:
+        snapshot = self._current()
+        if snapshot is not None:
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._current()
+            if snapshot is not None:
+                return snapshot
+            # Read the version first: a change committed during the load triggers another rebuild
+            version = self.version
+            async with AsyncSessionLocal() as db:
+                snapshot = await self._load(db)
+            self._snapshot, self._snapshot_version, self._built_at = snapshot, version, time.monotonic()
+            self.builds += 1
+            return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "builds": self.builds,
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._snapshot is not None else None,
+            "ttl_seconds": self.ttl
+        }
+
+
+@event.listens_for(Session, "after_flush")
+def _track_catalog_changes(session, flush_context):
+    changed = list(chain(session.new, session.dirty, session.deleted))
+    for cache in _caches:
+        if any(isinstance(obj, cache.models) for obj in changed):
+            session.info.setdefault("catalog_changes", set()).add(cache)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_catalog_changes(session):
+    # Check-ins move occupancy with Core UPDATEs, which never get here: live
+    # occupancy is overlaid from the occupancy store instead
+    for cache in session.info.pop("catalog_changes", ()):
+        cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
+
+
+async def _load_gyms(db: AsyncSession) -> GymCatalog:
+    gyms = (await db.scalars(select(Gym).where(Gym.is_active == True))).all()
+    return GymCatalog([GymEntry.from_gym(gym) for gym in gyms])
+
+
+async def _load_plans(db: AsyncSession) -> PlanCatalog:
+    plans = (await db.scalars(select(Plan).where(Plan.is_active == True).order_by(Plan.id))).all()
+    return PlanCatalog(plans)
+
+
+gym_catalog: SnapshotCache[GymCatalog] = SnapshotCache((Gym,), _load_gyms, settings.CACHE_TTL_SECONDS)
+plan_catalog: SnapshotCache[PlanCatalog] = SnapshotCache((Plan,), _load_plans, settings.CACHE_TTL_SECONDS)
+
+
+async def get_gym_catalog() -> GymCatalog:
+    return await gym_catalog.get()
+
+
+async def get_plan_catalog() -> PlanCatalog:
+    return await plan_catalog.get()
@@ -9,6 +9,21 @@ import secrets
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./unipass.db"
+    DB_ECHO: bool = False
+    
+    # Connection pool (server databases such as PostgreSQL)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # 30 minutes
+    DB_POOL_PRE_PING: bool = True
+    
+    # SQLite tuning (applied on every new connection)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 64 MB page cache per connection
+    SQLITE_MMAP_SIZE_MB: int = 256
     
     # Security
     SECRET_KEY: str = None
@@ -30,6 +45,7 @@ class Settings(BaseSettings):
     
     # Location Settings
     MAX_CHECKIN_DISTANCE_METERS: int = 100
+    TIMEZONE: str = "America/Sao_Paulo"  # Local day boundaries for check-in stats
     
     # Gamification
     POINTS_PER_CHECKIN: int = 10
@@ -49,10 +65,48 @@ class Settings(BaseSettings):
     ALLOWED_EXTENSIONS: list = ["jpg", "jpeg", "png", "gif"]
     
     # Rate Limiting
-    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_MINUTE: int = 60  # 0 disables the limiter
+    RATE_LIMIT_OVERRIDES: dict = {  # path prefix -> per-minute limit
+        "/api/auth/login": 10,
+        "/api/auth/token": 10,
+        "/api/auth/register": 5,
+    }
+    RATE_LIMIT_SHM_NAME: Optional[str] = "auto"  # auto = named per database and master process; empty = per-worker limits
+    RATE_LIMIT_SLOTS: int = 65536
     
     # Cache
-    CACHE_TTL_SECONDS: int = 300  # 5 minutes
+    CACHE_TTL_SECONDS: int = 300  # Gym/plan catalog snapshots; local admin edits invalidate sooner
+    
+    # Live occupancy shared between workers (auto = named per database and master process; empty keeps it process-local)
+    OCCUPANCY_SHM_NAME: Optional[str] = "auto"
+    OCCUPANCY_SLOTS: int = 65536  # Highest gym id + 1 that fits in the table
+    OCCUPANCY_SYNC_SECONDS: int = 5
+    # Server-sent occupancy stream (per worker)
+    OCCUPANCY_STREAM_INTERVAL_SECONDS: float = 1.0  # Changes are batched over this window
+    OCCUPANCY_STREAM_KEEPALIVE_SECONDS: int = 15
+    OCCUPANCY_STREAM_MAX_SUBSCRIBERS: int = 5000  # Further streams get 503
+    OCCUPANCY_STREAM_MAX_GYMS: int = 500  # Gyms one stream may watch
+    
+    # Group commit for check-in / checkout writes (0 = one commit per request)
+    GROUP_COMMIT_WINDOW_MS: int = 5
+    GROUP_COMMIT_MAX_BATCH: int = 64
+    
+    # bcrypt thread pool (per worker); requests beyond the queue limit get 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+    
+    # Authenticated-user cache (per worker)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Revoked tokens / deactivated users (per worker, rebuilt from the DB)
+    REVOCATION_SYNC_SECONDS: int = 10
+    REVOCATION_BLOOM_BITS: int = 1 << 20
+    REVOCATION_BLOOM_HASHES: int = 7
+    
+    # Idempotency-Key replay store (idempotency_keys table, shared by all workers)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 60  # A claim older than this with no response may be taken over
     
     @field_validator('SECRET_KEY', mode='before')
     @classmethod
@@ -0,0 +1,25 @@
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from .config import settings
+
+
+@lru_cache()
+def local_timezone() -> ZoneInfo:
+    return ZoneInfo(settings.TIMEZONE)
+
+
+def local_date(moment: Optional[datetime] = None) -> date:
+    """Local calendar date of a UTC timestamp (naive values are treated as UTC)"""
+    if moment is None:
+        moment = datetime.utcnow()
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(local_timezone()).date()
+
+
+def local_today() -> date:
+    return local_date()
+
@@ -0,0 +1,46 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Public catalogs may be stored by shared caches but must be revalidated;
+# per-user bodies only by the browser
+PUBLIC_REVALIDATE = "no-cache"
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def fingerprint(*chunks: bytes) -> str:
+    """Short stable digest of snapshot bytes; computed once per snapshot, not per request"""
+    digest = hashlib.blake2b(digest_size=12)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def strong_etag(*parts: str) -> str:
+    return '"' + "-".join(parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when If-None-Match names `etag` (weak comparison, as RFC 9110 asks for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def validator_headers(etag: str, cache_control: str = PUBLIC_REVALIDATE) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(request: Request, etag: str, cache_control: str = PUBLIC_REVALIDATE) -> Optional[Response]:
+    """A 304 response if the client already holds `etag`, else None"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag, cache_control))
+    return None
+
+
+def json_response(body: bytes, etag: str, cache_control: str = PUBLIC_REVALIDATE) -> Response:
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag, cache_control))
@@ -0,0 +1,181 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    a = (math.sin(math.radians(lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(
+    lat: float,
+    lon: float,
+    lat_rad: np.ndarray,
+    lon_rad: np.ndarray,
+    cos_lat: np.ndarray
+) -> np.ndarray:
+    """Distances from (lat, lon) in degrees to many points given in radians, with cos(lat) precomputed"""
+    origin_lat = math.radians(lat)
+    a = (np.sin((lat_rad - origin_lat) / 2) ** 2 +
+         math.cos(origin_lat) * cos_lat * np.sin((lon_rad - math.radians(lon)) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distances_km(lat: float, lon: float, points: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Distances from (lat, lon) to each (lat, lon) in `points`, all in degrees"""
+    coordinates = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    lat_rad, lon_rad = coordinates[:, 0], coordinates[:, 1]
+    return haversine_km_array(lat, lon, lat_rad, lon_rad, np.cos(lat_rad))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle; a cheap SQL prefilter"""
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - delta_lat), min(90.0, lat + delta_lat)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if cos_lat <= 1e-9:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lon = radius_km / (KM_PER_DEGREE * cos_lat)
+    if delta_lon >= 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - delta_lon, lon + delta_lon
+
+
+class GridIndex:
+    """Points bucketed into fixed lat/lon cells for radius and k-nearest queries.
+
+    Coordinates are stored as columns (radians, plus cos(lat)) sorted by cell,
+    row-major, so the cells of one grid row that overlap a query are a single
+    contiguous slice. A query gathers those slices and computes distances,
+    the radius mask and the ordering in one vectorized pass; its cost depends
+    on local density rather than on the size of the catalog. Points are
+    (key, lat, lon); results are (distance_km, key) sorted by distance.
+    Queries take an optional `allowed` boolean mask aligned with the input
+    points to skip the ones filtered out.
+    """
+
+    def __init__(self, points: Sequence[Tuple[int, float, float]], cell_degrees: float = 0.02):
+        self.cell = cell_degrees
+        self.size = len(points)
+        keys = np.array([point[0] for point in points], dtype=np.int64)
+        lats = np.array([point[1] for point in points], dtype=np.float64)
+        lons = np.array([point[2] for point in points], dtype=np.float64)
+
+        rows = np.floor(lats / cell_degrees).astype(np.int64)
+        cols = np.floor(lons / cell_degrees).astype(np.int64)
+        if self.size:
+            self._extent = (int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max()))
+        else:
+            self._extent = (0, 0, 0, 0)
+        min_col, max_col = self._extent[2], self._extent[3]
+        self._width = max_col - min_col + 1
+
+        order = np.lexsort((cols, rows))
+        self._source = order  # Input position of each stored point
+        self._codes = (rows * self._width + (cols - min_col))[order]
+        self._keys = keys[order]
+        self._lat_rad = np.radians(lats[order])
+        self._lon_rad = np.radians(lons[order])
+        self._cos_lat = np.cos(self._lat_rad)
+
+    def _cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell)), int(math.floor(lon / self.cell))
+
+    def _code(self, row: int, col: int) -> int:
+        return row * self._width + (col - self._extent[2])
+
+    def _candidates(self, low_row: int, high_row: int, low_col: int, high_col: int) -> np.ndarray:
+        """Positions of the points in the given rectangle of cells"""
+        min_row, max_row, min_col, max_col = self._extent
+        low_row, high_row = max(low_row, min_row), min(high_row, max_row)
+        low_col, high_col = max(low_col, min_col), min(high_col, max_col)
+        if low_row > high_row or low_col > high_col:
+            return np.empty(0, dtype=np.int64)
+        if low_col == min_col and high_col == max_col:
+            # Whole rows: the rectangle is one slice
+            start = np.searchsorted(self._codes, self._code(low_row, low_col), side="left")
+            end = np.searchsorted(self._codes, self._code(high_row, high_col), side="right")
+            return np.arange(start, end)
+        rows = np.arange(low_row, high_row + 1)
+        starts = np.searchsorted(self._codes, rows * self._width + (low_col - min_col), side="left")
+        ends = np.searchsorted(self._codes, rows * self._width + (high_col - min_col), side="right")
+        spans = [np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def _filter(self, positions: np.ndarray, allowed: Optional[np.ndarray]) -> np.ndarray:
+        if allowed is None:
+            return positions
+        return positions[allowed[self._source[positions]]]
+
+    def _distances(self, lat: float, lon: float, positions: np.ndarray) -> np.ndarray:
+        return haversine_km_array(
+            lat, lon, self._lat_rad[positions], self._lon_rad[positions], self._cos_lat[positions]
+        )
+
+    def _results(self, distances: np.ndarray, positions: np.ndarray) -> List[Tuple[float, int]]:
+        order = np.argsort(distances, kind="stable")
+        return list(zip(distances[order].tolist(), self._keys[positions[order]].tolist()))
+
+    def within(
+        self, lat: float, lon: float, radius_km: float, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        if not self.size:
+            return []
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        low_row, low_col = self._cell_of(min_lat, min_lon)
+        high_row, high_col = self._cell_of(max_lat, max_lon)
+        if max_lon - min_lon >= 360:
+            low_col, high_col = self._extent[2], self._extent[3]
+        positions = self._filter(self._candidates(low_row, high_row, low_col, high_col), allowed)
+        distances = self._distances(lat, lon, positions)
+        inside = distances <= radius_km
+        return self._results(distances[inside], positions[inside])
+
+    def box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Keys of the points inside a latitude/longitude rectangle, in no particular order"""
+        if not self.size:
+            return []
+        low_row, low_col = self._cell_of(min_lat, min_lon)
+        high_row, high_col = self._cell_of(max_lat, max_lon)
+        positions = self._candidates(low_row, high_row, low_col, high_col)
+        lat, lon = np.degrees(self._lat_rad[positions]), np.degrees(self._lon_rad[positions])
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return self._keys[positions[inside]].tolist()
+
+    def nearest(
+        self, lat: float, lon: float, k: int, allowed: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        k = min(k, self.size if allowed is None else int(np.count_nonzero(allowed)))
+        if k <= 0:
+            return []
+        row, col = self._cell_of(lat, lon)
+        min_row, max_row, min_col, max_col = self._extent
+        ring = 0
+        while True:
+            # Grow the square of cells around the query until the k-th best
+            # candidate is closer than anything outside the square can be
+            covers_all = (row - ring <= min_row and row + ring >= max_row and
+                          col - ring <= min_col and col + ring >= max_col)
+            positions = self._filter(self._candidates(row - ring, row + ring, col - ring, col + ring), allowed)
+            if len(positions) >= k:
+                distances = self._distances(lat, lon, positions)
+                best = np.argpartition(distances, k - 1)[:k]
+                if covers_all or distances[best].max() <= self._reach_km(lat, lon, row, col, ring):
+                    return self._results(distances[best], positions[best])
+            ring = ring * 2 or 1
+
+    def _reach_km(self, lat: float, lon: float, row: int, col: int, ring: int) -> float:
+        """Lower bound on the distance to any point outside the scanned square of cells"""
+        lat_gap = min(lat - (row - ring) * self.cell, (row + ring + 1) * self.cell - lat)
+        lon_gap = min(lon - (col - ring) * self.cell, (col + ring + 1) * self.cell - lon)
+        # Longitude degrees are narrowest at the square's edge farthest from the equator
+        edge_lat = min(90.0, abs(lat) + (ring + 1) * self.cell)
+        return min(lat_gap, lon_gap * math.cos(math.radians(edge_lat))) * KM_PER_DEGREE
@@ -0,0 +1,134 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.connection import AsyncSessionLocal
+from .config import settings
+
+Mutation = Callable[[AsyncSession], Awaitable[Any]]
+
+# SQLite: take the write lock when the batch starts, so no savepoint has to
+# upgrade a read snapshot that another writer has already moved past
+WRITE_TRANSACTION = {"sqlite_begin": "IMMEDIATE"}
+
+
+class GroupCommitWriter:
+    """Batch write transactions from concurrent requests into one commit.
+
+    Requests submit a mutation (an async callable taking the session) and
+    await its result. A single writer task collects mutations for up to
+    `window_ms` or `max_batch` entries, runs each inside its own SAVEPOINT
+    and commits them together, so N visitors cost one fsync instead of N.
+
+    A mutation that raises (e.g. an HTTPException for a full gym) is rolled
+    back to its savepoint and the exception is re-raised to its caller only;
+    the rest of the batch still commits. Results are delivered after the
+    commit, so callers never observe uncommitted state.
+
+    With window_ms=0, or before start() is called, submit() runs the mutation
+    in its own session and commits immediately (one commit per request).
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        window_ms: int = 5,
+        max_batch: int = 64
+    ):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.mutations = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.window > 0 and not self.is_running:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit whatever is still queued, then stop the writer task"""
+        if not self.is_running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, mutation: Mutation) -> Any:
+        if not self.is_running:
+            async with self.session_factory() as db:
+                await db.connection(execution_options=WRITE_TRANSACTION)
+                result = await mutation(db)
+                await db.commit()
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((mutation, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+
+    async def _commit(self, batch: List[Tuple[Mutation, asyncio.Future]]):
+        outcomes = []
+        try:
+            async with self.session_factory() as db:
+                await db.connection(execution_options=WRITE_TRANSACTION)
+                for mutation, future in batch:
+                    try:
+                        async with db.begin_nested():
+                            outcomes.append((future, await mutation(db), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+                await db.commit()
+        except Exception as error:
+            # The shared transaction failed: nobody in this batch was committed
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        self.batches += 1
+        self.mutations += len(batch)
+        for future, result, error in outcomes:
+            if future.done():  # Caller went away (client disconnect)
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+# Check-in / checkout writes share one writer per worker
+checkin_writer = GroupCommitWriter(
+    AsyncSessionLocal,
+    window_ms=settings.GROUP_COMMIT_WINDOW_MS,
+    max_batch=settings.GROUP_COMMIT_MAX_BATCH
+)
@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from .dates import local_timezone
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+SCHEDULE_BYTES = MINUTES_PER_WEEK // 8
+
+# "6h", "6h30", "06:00", "6" (only between two times), optionally spaced out
+_TIME = r"(\d{1,2})\s*(?:(?:h|:)\s*(\d{2})?\s*(?:min)?)?"
+_RANGE = re.compile(_TIME + r"\s*(?:as|a|ate|-|–|—)\s*" + _TIME)
+_ALWAYS_OPEN = re.compile(r"\b24\s*(?:h|hs|horas?)\b")
+_CLOSED = re.compile(r"\b(?:fechad[oa]|closed)\b")
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def parse_hours(text: Optional[str]) -> Optional[List[Tuple[int, int]]]:
+    """Open intervals of one day as [start, end) minutes after midnight.
+
+    Understands "6h às 22h", "6h30 - 22h", "05:30-23:00", several ranges
+    ("6h às 12h e 14h às 20h"), "24 horas" and "Fechado". A range ending at
+    or before its start runs past midnight, so its end exceeds 1440.
+    Returns None when the text cannot be read.
+    """
+    if not text or not text.strip():
+        return None
+    folded = _fold(text)
+    if _CLOSED.search(folded):
+        return []
+    intervals = []
+    for match in _RANGE.finditer(folded):
+        start_hour, start_minute, end_hour, end_minute = (int(value or 0) for value in match.groups())
+        if start_hour > 24 or end_hour > 24 or start_minute > 59 or end_minute > 59:
+            return None
+        start = start_hour * 60 + start_minute
+        end = end_hour * 60 + end_minute
+        if start >= MINUTES_PER_DAY:
+            return None
+        if end <= start:
+            end += MINUTES_PER_DAY
+        intervals.append((start, end))
+    if intervals:
+        return intervals
+    if _ALWAYS_OPEN.search(folded):
+        return [(0, MINUTES_PER_DAY)]
+    return None
+
+
+class WeeklySchedule:
+    """Minute-resolution open/closed bitmap over a week starting Monday 00:00.
+
+    One bit per minute of the week (1260 bytes). `known` is False when the
+    hours text could not be parsed; such gyms are treated as always open,
+    which is what is_open_now reported before hours were understood.
+    """
+
+    __slots__ = ("bitmap", "known")
+
+    def __init__(self, bitmap: bytes, known: bool = True):
+        self.bitmap = bitmap
+        self.known = known
+
+    def is_open(self, minute_of_week: int) -> bool:
+        return bool(self.bitmap[minute_of_week >> 3] >> (minute_of_week & 7) & 1)
+
+    def is_open_at(self, moment: datetime) -> bool:
+        return self.is_open(minute_of_week(moment))
+
+
+def _schedule(days: List[Optional[List[Tuple[int, int]]]]) -> WeeklySchedule:
+    bits = bytearray(SCHEDULE_BYTES)
+    known = all(intervals is not None for intervals in days)
+    if not known:
+        return WeeklySchedule(b"\xff" * SCHEDULE_BYTES, known=False)
+    for day, intervals in enumerate(days):
+        for start, end in intervals:
+            # Ranges past midnight spill into the next day (Sunday into Monday)
+            for minute in range(day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end):
+                minute %= MINUTES_PER_WEEK
+                bits[minute >> 3] |= 1 << (minute & 7)
+    return WeeklySchedule(bytes(bits))
+
+
+@lru_cache(maxsize=1024)
+def weekly_schedule(weekdays: Optional[str], weekends: Optional[str]) -> WeeklySchedule:
+    """Compile a gym's hours texts; identical texts share one compiled schedule"""
+    weekday_hours = parse_hours(weekdays)
+    weekend_hours = parse_hours(weekends)
+    return _schedule([weekday_hours] * 5 + [weekend_hours] * 2)
+
+
+def minute_of_week(moment: Optional[datetime] = None) -> int:
+    """Local minute of the week (Monday 00:00 = 0); naive values are local time"""
+    if moment is None:
+        moment = datetime.now(timezone.utc)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(local_timezone())
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.connection import AsyncSessionLocal
+from models.idempotency_key import IdempotencyKey
+from .auth import token_subject
+from .config import settings
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+
+StoredResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+class IdempotencyStore:
+    """Responses keyed by (user, Idempotency-Key) in the idempotency_keys table.
+
+    The row is inserted when the first request starts, so a retry that lands
+    on any worker while the original is still running waits for it instead
+    of executing the handler a second time; the (subject, key) primary key
+    decides which of two simultaneous first attempts runs. A claim whose
+    request has been running for longer than `lock_seconds` (its worker
+    died) may be taken over.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        ttl_seconds: int = 86400,
+        lock_seconds: int = 60,
+        poll_seconds: float = 0.05
+    ):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lock = timedelta(seconds=lock_seconds)
+        self.poll_seconds = poll_seconds
+        self.replays = 0
+
+    async def claim(self, subject: str, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+        """Record this request as running; returns the existing row if another one holds the key"""
+        match = (IdempotencyKey.subject == subject, IdempotencyKey.key == key)
+        while True:
+            now = datetime.utcnow()
+            async with self.session_factory() as db:
+                # An expired response or an abandoned claim no longer holds the key
+                await db.execute(
+                    delete(IdempotencyKey).where(*match, or_(
+                        IdempotencyKey.expires_at <= now,
+                        and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at <= now - self.lock)
+                    ))
+                )
+                try:
+                    await db.execute(insert(IdempotencyKey).values(
+                        subject=subject,
+                        key=key,
+                        fingerprint=fingerprint,
+                        created_at=now,
+                        expires_at=now + self.ttl
+                    ))
+                    await db.commit()
+                    return None
+                except IntegrityError:
+                    await db.rollback()
+                existing = (await db.execute(select(IdempotencyKey).where(*match))).scalar_one_or_none()
+            if existing is not None:
+                return existing
+            # Abandoned between our insert and select: try again
+
+    async def get(self, subject: str, key: str) -> Optional[IdempotencyKey]:
+        async with self.session_factory() as db:
+            return (await db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.subject == subject, IdempotencyKey.key == key)
+            )).scalar_one_or_none()
+
+    async def wait(self, subject: str, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+        """Claim the key, or wait until whoever holds it has stored a response.
+
+        Returns None once this request holds the key, otherwise the completed
+        row (or one with a different fingerprint, which is never waited on).
+        """
+        existing = await self.claim(subject, key, fingerprint)
+        while existing is not None and existing.status_code is None and existing.fingerprint == fingerprint:
+            await asyncio.sleep(self.poll_seconds)
+            existing = await self.get(subject, key)
+            if existing is None or existing.created_at <= datetime.utcnow() - self.lock:
+                # Abandoned, or its worker died: take it over
+                existing = await self.claim(subject, key, fingerprint)
+        return existing
+
+    async def complete(self, subject: str, key: str, response: StoredResponse):
+        status, headers, body = response
+        async with self.session_factory() as db:
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.subject == subject, IdempotencyKey.key == key)
+                .values(
+                    status_code=status,
+                    headers=json.dumps([[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers]),
+                    body=body
+                )
+            )
+            await db.commit()
+
+    async def abandon(self, subject: str, key: str):
+        """Forget a request that failed (5xx or exception) so a retry runs it again"""
+        async with self.session_factory() as db:
+            await db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.subject == subject,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status_code.is_(None)
+                )
+            )
+            await db.commit()
+
+    @staticmethod
+    def response(row: IdempotencyKey) -> StoredResponse:
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(row.headers or "[]")]
+        return row.status_code, headers, row.body or b""
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for a repeated Idempotency-Key.
+
+    Applies to authenticated POST/PUT/PATCH/DELETE requests that carry an
+    Idempotency-Key header; anything else passes straight through. Keys are
+    scoped to the token subject, and reusing a key with a different method,
+    path or body is rejected with 422. Responses with status >= 500 are not
+    stored, so the client may retry them with the same key.
+    """
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store or idempotency_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        headers: Dict[bytes, bytes] = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": "Invalid Idempotency-Key header"})
+            return
+
+        subject = token_subject(headers.get(b"authorization", b"").decode("latin-1"))
+        if subject is None:
+            # Unauthenticated: let the route reject it
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), scope["query_string"], body])
+        ).hexdigest()
+        key = idempotency_key.decode("latin-1")
+
+        existing = await self.store.wait(subject, key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                await _send_json(send, 422, {
+                    "detail": "Idempotency-Key was already used for a different request"
+                })
+                return
+            self.store.replays += 1
+            await _replay(send, self.store.response(existing))
+            return
+
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def replay_receive():
+            nonlocal body
+            if body is not None:
+                message = {"type": "http.request", "body": body, "more_body": False}
+                body = None
+                return message
+            return await receive()
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await asyncio.shield(self.store.abandon(subject, key))
+            raise
+
+        if captured["status"] >= 500:
+            await self.store.abandon(subject, key)
+        else:
+            await self.store.complete(subject, key, (
+                captured["status"], captured["headers"], b"".join(captured["body"])
+            ))
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _replay(send, response: StoredResponse):
+    status, headers, body = response
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": headers + [(b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, content: dict):
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# Shared by every worker through the database
+idempotency_store = IdempotencyStore(
+    AsyncSessionLocal,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS
+)
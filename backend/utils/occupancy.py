@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.sql import Update
+
+from database.connection import AsyncSessionLocal
+from models.gym import Gym
+from .config import settings
+from .shm import open_shared_memory, close_shared_memory, segment_name
+
+logger = logging.getLogger(__name__)
+
+
+def reserve_slot(gym_id: int) -> Update:
+    """Admit one visitor if the gym is active and below capacity.
+
+    The check and the increment happen in a single UPDATE, so concurrent
+    check-ins cannot over-admit. A returned (occupancy, capacity) row means
+    the slot was taken; no row means the gym is full, inactive or missing.
+    """
+    return (
+        update(Gym)
+        .where(
+            Gym.id == gym_id,
+            Gym.is_active == True,
+            Gym.current_occupancy < Gym.max_capacity
+        )
+        .values(current_occupancy=Gym.current_occupancy + 1)
+        .returning(Gym.current_occupancy, Gym.max_capacity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_slot(gym_id: int) -> Update:
+    """Give a slot back on checkout; never drops occupancy below zero"""
+    return (
+        update(Gym)
+        .where(Gym.id == gym_id, Gym.current_occupancy > 0)
+        .values(current_occupancy=Gym.current_occupancy - 1)
+        .returning(Gym.current_occupancy, Gym.max_capacity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Each slot is one 64-bit word: presence flag | capacity (31 bits) | occupancy (31 bits).
+# A single aligned word is written and read in one access, so readers never see
+# an occupancy from one update paired with the capacity of another.
+_PRESENT = 1 << 62
+_FIELD_BITS = 31
+_FIELD_MASK = (1 << _FIELD_BITS) - 1
+
+
+class OccupancyStore:
+    """(occupancy, capacity) per gym, indexed by gym id, shared across workers.
+
+    The database stays authoritative: check-in and checkout write the values
+    returned by their conditional UPDATE after committing, and a periodic sync
+    reloads the whole table so edits made outside the API converge.
+    """
+
+    def __init__(self, name: Optional[str] = None, slots: int = 65536):
+        self._shm = None
+        buffer = None
+        if name:
+            try:
+                self._shm = open_shared_memory(name, slots * 8)
+                buffer = self._shm.buf
+            except (OSError, ValueError):
+                self._shm = None
+        if buffer is None:
+            buffer = bytearray(slots * 8)
+        self._bytes = memoryview(buffer)[:slots * 8]
+        self._words = self._bytes.cast("Q")
+        self.slots = len(self._words)
+
+    @property
+    def is_shared(self) -> bool:
+        return self._shm is not None
+
+    @staticmethod
+    def unpack(word: int) -> Optional[Tuple[int, int]]:
+        """(occupancy, capacity) held in one slot word, or None for an empty slot"""
+        if not word & _PRESENT:
+            return None
+        return word & _FIELD_MASK, (word >> _FIELD_BITS) & _FIELD_MASK
+
+    def get(self, gym_id: int) -> Optional[Tuple[int, int]]:
+        """Return (occupancy, capacity), or None if the gym is not tracked"""
+        if not 0 < gym_id < self.slots:
+            return None
+        return self.unpack(self._words[gym_id])
+
+    def snapshot(self) -> np.ndarray:
+        """Copy of every slot word, indexed by gym id (decode with `unpack`)"""
+        return np.frombuffer(self._bytes, dtype=np.uint64).copy()
+
+    def get_many(self, gym_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorized get: (occupancy, capacity, tracked) arrays aligned with `gym_ids`"""
+        words = np.frombuffer(self._bytes, dtype=np.uint64)
+        in_range = (gym_ids > 0) & (gym_ids < self.slots)
+        values = np.where(in_range, words[np.where(in_range, gym_ids, 0)], 0)
+        tracked = (values & np.uint64(_PRESENT)) != 0
+        occupancy = (values & np.uint64(_FIELD_MASK)).astype(np.int64)
+        capacity = ((values >> np.uint64(_FIELD_BITS)) & np.uint64(_FIELD_MASK)).astype(np.int64)
+        return occupancy, capacity, tracked
+
+    def set(self, gym_id: int, occupancy: int, capacity: int):
+        if 0 < gym_id < self.slots:
+            self._words[gym_id] = (
+                _PRESENT
+                | (max(capacity, 0) & _FIELD_MASK) << _FIELD_BITS
+                | (max(occupancy, 0) & _FIELD_MASK)
+            )
+
+    def discard(self, gym_id: int):
+        if 0 < gym_id < self.slots:
+            self._words[gym_id] = 0
+
+    def close(self):
+        self._words.release()
+        self._bytes.release()
+        if self._shm is not None:
+            close_shared_memory(self._shm)
+            self._shm = None
+
+
+@lru_cache()
+def get_occupancy_store() -> OccupancyStore:
+    name = segment_name(settings.OCCUPANCY_SHM_NAME, "occ", settings.DATABASE_URL)
+    return OccupancyStore(name, settings.OCCUPANCY_SLOTS)
+
+
+def live_occupancy(gym) -> Tuple[int, int]:
+    """Current (occupancy, capacity) for a gym row, preferring the shared store"""
+    live = get_occupancy_store().get(gym.id)
+    if live is None:
+        return gym.current_occupancy, gym.max_capacity
+    return live
+
+
+def occupancy_percentage(occupancy: int, capacity: int) -> float:
+    if capacity == 0:
+        return 0
+    return (occupancy / capacity) * 100
+
+
+async def refresh_occupancy_store():
+    """Reload every gym's occupancy and capacity from the database"""
+    store = get_occupancy_store()
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(Gym.id, Gym.current_occupancy, Gym.max_capacity))
+        seen = set()
+        for gym_id, occupancy, capacity in rows:
+            store.set(gym_id, occupancy or 0, capacity or 0)
+            seen.add(gym_id)
+    # Clear slots of gyms deleted since the last sync
+    tracked = np.flatnonzero(store.snapshot() & np.uint64(_PRESENT))
+    for gym_id in tracked.tolist():
+        if gym_id not in seen:
+            store.discard(gym_id)
+
+
+async def run_occupancy_sync(interval_seconds: int):
+    """Background task: keep the store converged with the gyms table"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await refresh_occupancy_store()
+        except Exception:
+            # Next cycle retries; live values from check-ins keep flowing meanwhile
+            logger.exception("Occupancy store sync failed")
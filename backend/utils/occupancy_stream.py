@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Iterable, Optional, Sequence, Set
+
+import numpy as np
+
+from .catalog import GymEntry, dump_json
+from .config import settings
+from .occupancy import OccupancyStore, get_occupancy_store, live_occupancy, occupancy_percentage
+
+logger = logging.getLogger(__name__)
+
+# Clients reconnect after this many milliseconds if the stream drops
+RETRY_MS = 5000
+
+
+def occupancy_json(gym_id: int, occupancy: int, capacity: int) -> bytes:
+    return dump_json({
+        "id": gym_id,
+        "current_occupancy": occupancy,
+        "max_capacity": capacity,
+        "occupancy_percentage": float(occupancy_percentage(occupancy, capacity))
+    })
+
+
+def sse_event(fragments: Iterable[bytes]) -> bytes:
+    """One "occupancy" event whose data is a JSON list of already serialized gyms"""
+    return b"event: occupancy\ndata: [" + b",".join(fragments) + b"]\n\n"
+
+
+class Subscriber:
+    """One open stream: the gyms it watches and what it has not been sent yet"""
+    __slots__ = ("gym_ids", "pending", "ready")
+
+    def __init__(self, gym_ids: Set[int]):
+        self.gym_ids = gym_ids
+        self.pending: Dict[int, bytes] = {}  # gym id -> latest serialized value
+        self.ready = asyncio.Event()
+
+
+class OccupancyBroadcaster:
+    """Pushes live occupancy changes to subscribed streams, batched per interval.
+
+    Check-ins, checkouts, visits and forced checkouts in every worker write
+    their result to the shared occupancy store. Once per interval the
+    publisher compares the store with its copy from the previous tick, so a
+    gym that changed ten times in that second costs one event. Streams are
+    indexed by gym id: a tick only touches the streams watching a gym that
+    changed, and each changed gym is serialized once however many streams
+    receive it. A slow client holds at most one pending value per gym.
+    """
+
+    def __init__(self, interval_seconds: float = 1.0, max_subscribers: int = 5000):
+        self.interval = interval_seconds
+        self.max_subscribers = max_subscribers
+        self._watchers: Dict[int, Set[Subscriber]] = {}
+        self._subscribers = 0
+        self._previous: Optional[np.ndarray] = None
+        self.ticks = 0
+        self.deliveries = 0
+
+    @property
+    def is_full(self) -> bool:
+        return self._subscribers >= self.max_subscribers
+
+    def subscribe(self, gym_ids: Iterable[int]) -> Subscriber:
+        subscriber = Subscriber(set(gym_ids))
+        for gym_id in subscriber.gym_ids:
+            self._watchers.setdefault(gym_id, set()).add(subscriber)
+        self._subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for gym_id in subscriber.gym_ids:
+            watchers = self._watchers.get(gym_id)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self._watchers[gym_id]
+        self._subscribers -= 1
+
+    def publish(self) -> int:
+        """Queue every change since the previous call to its watchers; returns gyms changed"""
+        current = get_occupancy_store().snapshot()
+        previous, self._previous = self._previous, current
+        self.ticks += 1
+        if previous is None or not self._watchers:
+            return 0
+        changed = np.flatnonzero(current != previous)
+        for gym_id in changed.tolist():
+            watchers = self._watchers.get(gym_id)
+            live = OccupancyStore.unpack(int(current[gym_id])) if watchers else None
+            if live is None:
+                continue
+            fragment = occupancy_json(gym_id, *live)
+            for subscriber in watchers:
+                subscriber.pending[gym_id] = fragment
+                subscriber.ready.set()
+        return len(changed)
+
+    async def run(self):
+        """Background task: publish once per interval"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Occupancy stream publish failed")
+
+    async def stream(self, gyms: Sequence[GymEntry], keepalive_seconds: float) -> AsyncIterator[bytes]:
+        """SSE body: the current values of `gyms`, then each batch of their changes as it comes"""
+        # Subscribed here, not by the route, so the finally below always unsubscribes
+        subscriber = self.subscribe(gym.id for gym in gyms)
+        try:
+            initial = [occupancy_json(gym.id, *live_occupancy(gym)) for gym in gyms]
+            yield b"retry: %d\n" % RETRY_MS + sse_event(initial)
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), keepalive_seconds)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield b": keepalive\n\n"
+                    continue
+                subscriber.ready.clear()
+                pending, subscriber.pending = subscriber.pending, {}
+                self.deliveries += 1
+                yield sse_event(pending.values())
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": self._subscribers,
+            "watched_gyms": len(self._watchers),
+            "ticks": self.ticks,
+            "deliveries": self.deliveries
+        }
+
+
+occupancy_broadcaster = OccupancyBroadcaster(
+    settings.OCCUPANCY_STREAM_INTERVAL_SECONDS, settings.OCCUPANCY_STREAM_MAX_SUBSCRIBERS
+)
@@ -0,0 +1,80 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from .metrics import LatencyStats
+
+
+class PasswordHasher:
+    """Run bcrypt off the event loop on a small, bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so a thread pool gives real
+    parallelism without blocking other requests. At most `queue_limit`
+    operations may be waiting or running; beyond that callers get a 503
+    with a Retry-After estimate instead of piling up behind a login burst.
+    """
+
+    def __init__(self, context: CryptContext, workers: int = 2, queue_limit: int = 32):
+        self.context = context
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.rejected = 0
+        self.hash_latency = LatencyStats()
+        self.queue_wait = LatencyStats()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        per_operation = self.hash_latency.mean or 0.25
+        return max(1, math.ceil(self.in_flight * per_operation / self.workers))
+
+    async def _run(self, function: Callable, *args) -> Any:
+        if self.in_flight >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after())}
+            )
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                self.queue_wait.record(started - submitted)
+                self.hash_latency.record(time.perf_counter() - started)
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "hash_latency": self.hash_latency.stats(),
+            "queue_wait": self.queue_wait.stats()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
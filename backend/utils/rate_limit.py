@@ -0,0 +1,201 @@
+import hashlib
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .auth import token_subject
+from .config import settings
+from .shm import open_shared_memory, close_shared_memory, segment_name
+
+# (allowed, remaining, seconds until the quota is full again, seconds to wait if refused)
+Decision = Tuple[bool, int, float, float]
+
+EXEMPT_PATHS = ("/", "/health", "/docs", "/redoc", "/openapi.json")
+
+
+def gcra(tat: float, now: float, limit: int, window: float) -> Tuple[Decision, float]:
+    """Generic cell rate algorithm: a token bucket kept as one timestamp.
+
+    `tat` is the theoretical arrival time of the next request; the bucket is
+    full whenever tat <= now. Returns the decision and the tat to store.
+    """
+    interval = window / limit
+    new_tat = max(tat, now) + interval
+    allow_at = new_tat - window
+    if now < allow_at:
+        return (False, 0, max(tat, now) - now, allow_at - now), tat
+    remaining = int((window - (new_tat - now)) / interval + 1e-9)
+    return (True, remaining, new_tat - now, 0.0), new_tat
+
+
+class RateLimitBackend(ABC):
+    """Where limiter state lives; `hit` records one request against `key`"""
+
+    @abstractmethod
+    def hit(self, key: str, limit: int, window: float) -> Decision:
+        ...
+
+    def close(self):
+        pass
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-worker state in sharded dicts.
+
+    The limiter runs on the event loop, so no locks are needed; shards keep
+    the periodic cleanup of idle keys short (one shard per sweep).
+    """
+
+    def __init__(self, shards: int = 64, max_keys: int = 100000):
+        self._shards: List[Dict[str, float]] = [{} for _ in range(shards)]
+        self._max_per_shard = max(1, max_keys // shards)
+
+    def hit(self, key: str, limit: int, window: float) -> Decision:
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.time()
+        decision, tat = gcra(shard.get(key, 0.0), now, limit, window)
+        shard[key] = tat
+        if len(shard) > self._max_per_shard:
+            # A key whose bucket has refilled is equivalent to a missing key
+            for idle in [k for k, t in shard.items() if t <= now]:
+                del shard[idle]
+        return decision
+
+
+# Each slot is one 64-bit word: key fingerprint (22 bits) | tat in ms (42 bits).
+# One aligned word per key means a read never mixes two writers' values.
+_TAT_BITS = 42
+_TAT_MASK = (1 << _TAT_BITS) - 1
+
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """State in a shared-memory table so all workers of a server share one budget.
+
+    Keys map to a slot by hash; a different key landing on the same slot
+    replaces it (its bucket starts full again). Updates are a plain
+    read-modify-write without locks, so two workers hitting the same key at
+    the same instant can both be admitted: the limit is approximate under
+    that race, and the table never blocks a request.
+    """
+
+    def __init__(self, name: str, slots: int = 65536):
+        self._shm = open_shared_memory(name, slots * 8)
+        self._bytes = memoryview(self._shm.buf)[:slots * 8]
+        self._words = self._bytes.cast("Q")
+        self.slots = len(self._words)
+
+    def hit(self, key: str, limit: int, window: float) -> Decision:
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        slot = digest % self.slots
+        fingerprint = digest >> _TAT_BITS
+        now = time.time()
+
+        word = self._words[slot]
+        tat = (word & _TAT_MASK) / 1000 if word >> _TAT_BITS == fingerprint else 0.0
+        decision, new_tat = gcra(tat, now, limit, window)
+        if decision[0]:
+            self._words[slot] = fingerprint << _TAT_BITS | (int(new_tat * 1000) & _TAT_MASK)
+        return decision
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._words.release()
+        self._bytes.release()
+        close_shared_memory(self._shm)
+        self._shm = None
+
+
+@lru_cache()
+def get_rate_limit_backend() -> RateLimitBackend:
+    name = segment_name(settings.RATE_LIMIT_SHM_NAME, "rl", settings.DATABASE_URL)
+    if name:
+        try:
+            return SharedRateLimitBackend(name, settings.RATE_LIMIT_SLOTS)
+        except (OSError, ValueError):
+            pass
+    return MemoryRateLimitBackend()
+
+
+class RateLimitMiddleware:
+    """Limit requests per minute per caller, with per-path overrides.
+
+    Callers are identified by the subject of a valid bearer token, otherwise
+    by client IP. `overrides` maps a path prefix to its own per-minute limit
+    (the longest matching prefix wins and gets a separate budget); a limit of
+    0 exempts the prefix. Every limited response carries RateLimit-Limit,
+    RateLimit-Remaining, RateLimit-Reset and RateLimit-Policy headers, and a
+    refused request gets 429 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        app,
+        per_minute: int = 60,
+        overrides: Optional[Dict[str, int]] = None,
+        backend: Optional[RateLimitBackend] = None
+    ):
+        self.app = app
+        self.per_minute = per_minute
+        self.overrides = sorted((overrides or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.backend = backend or get_rate_limit_backend()
+        self.window = 60.0
+
+    def _rule(self, path: str) -> Tuple[str, int]:
+        for prefix, limit in self.overrides:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "*", self.per_minute
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        rule, limit = self._rule(scope["path"])
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        subject = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                subject = token_subject(value.decode("latin-1"))
+                break
+        if subject is not None:
+            identity = f"user:{subject}"
+        else:
+            client = scope.get("client")
+            identity = f"ip:{client[0] if client else 'unknown'}"
+
+        allowed, remaining, reset, retry_after = self.backend.hit(f"{identity}|{rule}", limit, self.window)
+        headers = [
+            (b"ratelimit-limit", str(limit).encode()),
+            (b"ratelimit-remaining", str(remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(reset)).encode()),
+            (b"ratelimit-policy", f"{limit};w={int(self.window)}".encode()),
+        ]
+
+        if not allowed:
+            body = json.dumps({"detail": "Too many requests"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
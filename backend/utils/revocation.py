@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import or_, select
+
+from database.connection import AsyncSessionLocal
+from models.user import User
+from models.revoked_token import RevokedToken
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over str keys (no false negatives)"""
+
+    def __init__(self, bits: int = 1 << 20, hashes: int = 7):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: k probes from one 64-bit hash
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _whole_seconds(revoked_at: float) -> float:
+    return revoked_at if revoked_at == math.inf else math.floor(revoked_at)
+
+
+class RevocationList:
+    """Revoked access-token ids and per-user revocation times, checked without the DB.
+
+    A user entry rejects every token issued before its revocation time:
+    deactivating a user revokes at +inf (no token is accepted), and
+    reactivating lowers it to the moment of deactivation, so only tokens
+    issued before then stay rejected. Token `iat` has one-second
+    resolution, so revocation times are truncated to the second; a token
+    issued in the same second as a deactivation is accepted again once the
+    user is reactivated, never the other way round.
+
+    Almost every request is not revoked, so lookups go to the Bloom filter
+    first and only its (rare) positives are confirmed in the exact maps.
+    Changes made by this worker apply immediately; the whole list is rebuilt
+    from the database at startup and every REVOCATION_SYNC_SECONDS, which is
+    how changes made by other workers arrive.
+    """
+
+    def __init__(self, bloom_bits: int = 1 << 20, bloom_hashes: int = 7):
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        self._tokens: Dict[str, float] = {}  # jti -> expiry (unix time)
+        self._users: Dict[int, float] = {}  # user id -> tokens issued before this (unix time) are revoked
+        self.bloom_positives = 0
+        self.false_positives = 0
+
+    def is_revoked(self, jti: Optional[str], user_id: Optional[int], issued_at: Optional[float]) -> bool:
+        if jti is not None and f"t:{jti}" in self._bloom:
+            self.bloom_positives += 1
+            if jti in self._tokens:
+                return True
+            self.false_positives += 1
+        if user_id is not None and f"u:{user_id}" in self._bloom:
+            self.bloom_positives += 1
+            revoked_at = self._users.get(user_id)
+            if revoked_at is None:
+                self.false_positives += 1
+            elif issued_at is None or issued_at < revoked_at:
+                return True
+        return False
+
+    def revoke_token(self, jti: str, expires_at: float):
+        self._tokens[jti] = expires_at
+        self._bloom.add(f"t:{jti}")
+
+    def deactivate_user(self, user_id: int):
+        self._users[user_id] = math.inf
+        self._bloom.add(f"u:{user_id}")
+
+    def reactivate_user(self, user_id: int, revoked_at: float):
+        """Accept tokens again, except those issued before `revoked_at` (unix time)"""
+        self._users[user_id] = _whole_seconds(revoked_at)
+        self._bloom.add(f"u:{user_id}")
+
+    def rebuild(self, tokens: Dict[str, float], users: Dict[int, float]):
+        """Replace the contents; expired token ids are dropped"""
+        now = time.time()
+        bloom = BloomFilter(self.bloom_bits, self.bloom_hashes)
+        tokens = {jti: expires_at for jti, expires_at in tokens.items() if expires_at > now}
+        users = {user_id: _whole_seconds(revoked_at) for user_id, revoked_at in users.items()}
+        for jti in tokens:
+            bloom.add(f"t:{jti}")
+        for user_id in users:
+            bloom.add(f"u:{user_id}")
+        # Swap in one step so concurrent lookups see either the old or the new list
+        self._bloom, self._tokens, self._users = bloom, tokens, users
+
+    def stats(self) -> dict:
+        return {
+            "revoked_tokens": len(self._tokens),
+            "revoked_users": len(self._users),
+            "deactivated_users": sum(1 for revoked_at in self._users.values() if revoked_at == math.inf),
+            "bloom_bits": self.bloom_bits,
+            "bloom_hashes": self.bloom_hashes,
+            "bloom_positives": self.bloom_positives,
+            "false_positives": self.false_positives
+        }
+
+
+revocation_list = RevocationList(
+    bloom_bits=settings.REVOCATION_BLOOM_BITS,
+    bloom_hashes=settings.REVOCATION_BLOOM_HASHES
+)
+
+
+def unix_time(value: datetime) -> float:
+    """Seconds since the epoch of a naive UTC datetime"""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+async def refresh_revocation_list():
+    """Rebuild the revocation list from the users and revoked_tokens tables"""
+    now = datetime.utcnow()
+    # Tokens issued before this have expired, so older revocations no longer matter
+    horizon = now - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    async with AsyncSessionLocal() as db:
+        users = (await db.execute(select(User.id, User.is_active, User.tokens_revoked_at).where(
+            or_(User.is_active == False, User.tokens_revoked_at > horizon)
+        ))).all()
+        rows = (await db.execute(select(RevokedToken.jti, RevokedToken.expires_at).where(
+            RevokedToken.expires_at > now
+        ))).all()
+    revocation_list.rebuild(
+        {jti: unix_time(expires_at) for jti, expires_at in rows},
+        {
+            user_id: math.inf if not is_active else unix_time(revoked_at)
+            for user_id, is_active, revoked_at in users
+        }
+    )
+
+
+async def run_revocation_sync(interval_seconds: int):
+    """Background task: pick up revocations made by other workers"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await refresh_revocation_list()
+        except Exception:
+            logger.exception("Revocation list sync failed")
@@ -0,0 +1,103 @@
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, table
+from sqlalchemy.engine import Engine
+
+# External-content FTS5 index over the searchable gym text. unicode61 with
+# remove_diacritics folds case and accents on both the indexed text and the
+# query, so "sao caetano" matches "São Caetano".
+SEARCH_TABLE = "gyms_fts"
+SEARCH_COLUMNS = ("name", "address", "amenities", "description")
+# bm25() weights, in SEARCH_COLUMNS order: a hit in the name counts most
+SEARCH_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, address, amenities, description,
+        content='gyms', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON gyms BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, address, amenities, description)
+        VALUES (new.id, new.name, new.address, new.amenities, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON gyms BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, address, amenities, description)
+        VALUES ('delete', old.id, old.name, old.address, old.amenities, old.description);
+    END""",
+    # Only text columns: occupancy updates on every check-in must not touch the index
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF name, address, amenities, description ON gyms BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, address, amenities, description)
+        VALUES ('delete', old.id, old.name, old.address, old.amenities, old.description);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, address, amenities, description)
+        VALUES (new.id, new.name, new.address, new.amenities, new.description);
+    END""",
+]
+
+# Connecting words that rarely appear in gym names or addresses
+STOPWORDS = frozenset({
+    "a", "o", "as", "os", "e", "de", "da", "do", "das", "dos", "em", "na", "no", "nas", "nos",
+    "um", "uma", "com", "para", "por", "the", "and", "of"
+})
+
+# Distance (km) at which a match's relevance is halved when ranking near a point
+DISTANCE_SCALE_KM = 5.0
+
+search_index = table(SEARCH_TABLE, column("rowid"), column(SEARCH_TABLE))
+
+
+def supports_full_text(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def create_search_index(engine: Engine):
+    """Create the FTS5 table and its sync triggers, filling it on first creation"""
+    if not supports_full_text(engine):
+        return
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+        ).first()
+        for statement in _DDL:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            conn.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def rebuild_search_index(engine: Engine):
+    """Re-derive the whole index from the gyms table"""
+    if supports_full_text(engine):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(q: str) -> Optional[str]:
+    """FTS5 query for free text: every word must match, each as a prefix.
+
+    Words are quoted so user input can never be read as FTS syntax. Prefix
+    matching also covers simple plurals ("academia" finds "academias").
+    Returns None when nothing searchable is left.
+    """
+    words = [word for word in re.findall(r"\w+", q.lower()) if word not in STOPWORDS]
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def match_clause(expression: str):
+    """WHERE clause for `expression` against the search index"""
+    return search_index.c[SEARCH_TABLE].match(expression)
+
+
+def relevance():
+    """bm25() score of the current row; lower is more relevant"""
+    return func.bm25(literal_column(SEARCH_TABLE), *SEARCH_WEIGHTS)
+
+
+def combined_score(bm25_score: float, distance_km: Optional[float]) -> float:
+    """Higher is better: text relevance, discounted by distance when known"""
+    score = -bm25_score
+    if distance_km is None:
+        return score
+    return score / (1 + distance_km / DISTANCE_SCALE_KM)
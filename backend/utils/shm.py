@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows frees a segment when its last handle closes
+    fcntl = None
+
+# Setting value that derives a per-deployment segment name (see segment_name)
+AUTO = "auto"
+
+
+def segment_name(setting: Optional[str], purpose: str, database_url: str) -> Optional[str]:
+    """Resolve a *_SHM_NAME setting to the segment to open.
+
+    "auto" names the segment after the database and the master process
+    (the workers' parent), so separate deployments on one host never share
+    it and a restart starts from a fresh table. An empty setting disables
+    sharing; any other value is used as-is.
+    """
+    if not setting:
+        return None
+    if setting != AUTO:
+        return setting
+    database = hashlib.blake2b(database_url.encode(), digest_size=4).hexdigest()
+    # Kept short: macOS limits segment names to 31 characters
+    return f"unipass_{purpose}_{database}_{os.getppid()}"
+
+
+def _lock_path(name: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+
+@contextmanager
+def _attachments(name: str):
+    """Hold the segment's lock file; yields [count] of attached processes to update"""
+    if fcntl is None:
+        yield [1]
+        return
+    with open(_lock_path(name), "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        lock.seek(0)
+        count = [int(lock.read() or 0)]
+        yield count
+        if count[0] > 0:
+            lock.seek(0)
+            lock.truncate()
+            lock.write(str(count[0]))
+        else:
+            os.unlink(lock.name)
+
+
+def _track(shm: shared_memory.SharedMemory, tracked: bool):
+    # Workers come and go independently; don't let the resource tracker of
+    # the first one to exit unlink the segment from under the others.
+    # close_shared_memory() unlinks it once the last worker detaches.
+    if os.name != "posix":
+        return
+    try:
+        from multiprocessing import resource_tracker
+        if tracked:
+            resource_tracker.register(f"/{shm.name}", "shared_memory")
+        else:
+            resource_tracker.unregister(f"/{shm.name}", "shared_memory")
+    except Exception:
+        pass
+
+
+def open_shared_memory(name: str, size: int) -> shared_memory.SharedMemory:
+    """Create the named segment, or attach to it if another worker already did"""
+    with _attachments(name) as count:
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=name)
+        _track(shm, False)
+        count[0] += 1
+    return shm
+
+
+def close_shared_memory(shm: shared_memory.SharedMemory):
+    """Detach from a segment; the last process to detach unlinks it"""
+    with _attachments(shm.name) as count:
+        count[0] = max(count[0] - 1, 0)
+        shm.close()
+        if count[0] == 0 and fcntl is not None:
+            try:
+                _track(shm, True)  # unlink() unregisters it again
+                shm.unlink()
+            except FileNotFoundError:
+                pass